@@ -0,0 +1,117 @@
+"""
+Write Elmer mesh files directly from the current gmsh model
+============================================================
+
+Produces mesh.header, mesh.nodes, mesh.elements and mesh.boundary in
+Elmer's native format - the same files `ElmerGrid 14 2 mesh.msh` creates
+for a serial run - without spawning ElmerGrid or re-parsing the .msh.
+
+Bodies are the physical groups of the model's top dimension, boundaries
+the physical groups one dimension lower. Only first-order lines, triangles,
+quads and tetrahedra are handled. Call while gmsh is initialized, after
+mesh.generate().
+"""
+
+import os
+
+import numpy as np
+import gmsh
+
+# gmsh element type -> (Elmer element code, local node indices of each side)
+ELEMENT_TYPES = {
+    1: (202, None),                                            # 2-node line
+    2: (303, [(0, 1), (1, 2), (2, 0)]),                        # 3-node triangle
+    3: (404, [(0, 1), (1, 2), (2, 3), (3, 0)]),                # 4-node quad
+    4: (504, [(0, 1, 2), (0, 1, 3), (0, 2, 3), (1, 2, 3)]),    # 4-node tetrahedron
+}
+
+
+def _physical_elements(dim, index):
+    """Return [(physical tag, gmsh type, connectivity)] for all groups of dim"""
+    blocks = []
+    for _, phys in gmsh.model.getPhysicalGroups(dim):
+        for entity in gmsh.model.getEntitiesForPhysicalGroup(dim, phys):
+            types, _, node_tags = gmsh.model.mesh.getElements(dim, entity)
+            for etype, nodes in zip(types, node_tags):
+                if etype not in ELEMENT_TYPES:
+                    name = gmsh.model.mesh.getElementProperties(etype)[0]
+                    raise ValueError(f"gmsh element type {etype} ({name}) is not supported; "
+                                     "only linear lines, triangles, quads and tetrahedra are "
+                                     "written, convert other meshes with ElmerGrid")
+                n = ELEMENT_TYPES[etype][0] % 100
+                conn = index[np.asarray(nodes, dtype=np.int64)].reshape(-1, n)
+                blocks.append((phys, etype, conn))
+    return blocks
+
+
+def _write_rows(f, rows, fmt):
+    """Write a 2D array with one fmt line per row, formatted in a single call"""
+    if len(rows):
+        f.write((fmt + "\n") * len(rows) % tuple(rows.ravel().tolist()))
+
+
+def write_elmer_mesh(out_dir):
+    """Write the current gmsh mesh to out_dir as an Elmer mesh database"""
+    dim = gmsh.model.getDimension()
+
+    node_tags, coords, _ = gmsh.model.mesh.getNodes()
+    node_tags = np.asarray(node_tags, dtype=np.int64)
+    coords = np.asarray(coords).reshape(-1, 3)
+
+    # Elmer expects node ids 1..N; gmsh tags may have gaps
+    index = np.zeros(node_tags.max() + 1, dtype=np.int64)
+    index[node_tags] = np.arange(1, len(node_tags) + 1)
+
+    bulk = _physical_elements(dim, index)
+    boundary = _physical_elements(dim - 1, index)
+
+    # Only sides made entirely of boundary nodes can belong to a boundary
+    # element, so just those are indexed to find the parent elements
+    boundary_nodes = np.unique(np.concatenate(
+        [conn.ravel() for _, _, conn in boundary] or [np.empty(0, dtype=np.int64)]))
+    parents = {}
+    n_elements = 0
+    for _, etype, conn in bulk:
+        sides = np.asarray(ELEMENT_TYPES[etype][1])
+        side_nodes = np.sort(conn[:, sides], axis=2).reshape(-1, sides.shape[1])
+        side_parents = np.repeat(np.arange(n_elements + 1, n_elements + len(conn) + 1), len(sides))
+        on_boundary = np.isin(side_nodes, boundary_nodes).all(axis=1)
+        for key, parent in zip(map(tuple, side_nodes[on_boundary].tolist()),
+                               side_parents[on_boundary].tolist()):
+            parents.setdefault(key, []).append(parent)
+        n_elements += len(conn)
+
+    n_boundary = sum(len(conn) for _, _, conn in boundary)
+
+    type_counts = {}
+    for _, etype, conn in bulk + boundary:
+        code = ELEMENT_TYPES[etype][0]
+        type_counts[code] = type_counts.get(code, 0) + len(conn)
+
+    with open(os.path.join(out_dir, "mesh.header"), 'w') as f:
+        f.write(f"{len(node_tags)} {n_elements} {n_boundary}\n")
+        f.write(f"{len(type_counts)}\n")
+        for code, count in type_counts.items():
+            f.write(f"{code} {count}\n")
+
+    with open(os.path.join(out_dir, "mesh.nodes"), 'w') as f:
+        ids = np.arange(1, len(node_tags) + 1)
+        _write_rows(f, np.column_stack([ids, coords]), "%d -1 %.12g %.12g %.12g")
+
+    with open(os.path.join(out_dir, "mesh.elements"), 'w') as f:
+        element_id = 0
+        for phys, etype, conn in bulk:
+            ids = np.arange(element_id + 1, element_id + len(conn) + 1)
+            element_id += len(conn)
+            _write_rows(f, np.column_stack([ids, np.full_like(ids, phys),
+                                            np.full_like(ids, ELEMENT_TYPES[etype][0]), conn]),
+                        " ".join(["%d"] * (3 + conn.shape[1])))
+
+    with open(os.path.join(out_dir, "mesh.boundary"), 'w') as f:
+        boundary_id = 0
+        for phys, etype, conn in boundary:
+            code = ELEMENT_TYPES[etype][0]
+            for row in conn.tolist():
+                boundary_id += 1
+                p = parents.get(tuple(sorted(row)), []) + [0, 0]
+                f.write(f"{boundary_id} {phys} {p[0]} {p[1]} {code} {' '.join(map(str, row))}\n")
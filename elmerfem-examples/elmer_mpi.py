@@ -0,0 +1,23 @@
+"""
+MPI settings shared by the Elmer example scripts
+================================================
+
+ElmerGrid partitions the mesh with METIS and ElmerSolver_mpi runs one rank
+per part when an MPI build is available; otherwise the run is serial.
+"""
+
+import os
+import shutil
+
+
+def mpi_settings(cap=2):
+    """Return (mpi_procs, use_mpi, partition_args) for ElmerGrid and mpirun
+
+    These meshes have at most a few thousand elements, so the rank count is
+    capped at cap: more partitions would mostly add MPI start-up and halo
+    exchange.
+    """
+    mpi_procs = min(os.cpu_count() or 1, cap)
+    use_mpi = bool(mpi_procs > 1 and shutil.which("mpirun") and shutil.which("ElmerSolver_mpi"))
+    partition_args = ["-partdual", "-metiskway", str(mpi_procs)] if use_mpi else []
+    return mpi_procs, use_mpi, partition_args
@@ -3,19 +3,16 @@
 Inspect VTU file structure
 """
 
+import io
 import sys
 import os
-
-try:
-    import pyvista as pv
-except ImportError:
-    print("ERROR: pyvista not found!")
-    sys.exit(1)
+import contextlib
+import xml.etree.ElementTree as ET
 
 if len(sys.argv) < 2:
     print("Usage: python3 inspect_vtu.py <vtu_file>")
     print("\nLooking for VTU files in current directory...")
-    vtu_files = [f for f in os.listdir('.') if f.endswith('.vtu')]
+    vtu_files = [e.name for e in os.scandir('.') if e.name.endswith('.vtu')]
     if vtu_files:
         print(f"\nFound {len(vtu_files)} VTU files:")
         for f in vtu_files:
@@ -29,75 +26,159 @@ if not os.path.exists(vtu_file):
     print(f"ERROR: File not found: {vtu_file}")
     sys.exit(1)
 
-print("=" * 60)
-print(f"Inspecting: {vtu_file}")
-print("=" * 60)
-
-# Read the VTU file
-mesh = pv.read(vtu_file)
-
-print(f"\nFile size: {os.path.getsize(vtu_file)} bytes")
-print(f"Number of points: {mesh.n_points}")
-print(f"Number of cells: {mesh.n_cells}")
-print(f"Bounds: {mesh.bounds}")
+# Heavy imports come after the argument checks so the usage path stays fast
+try:
+    import pyvista as pv
+except ImportError:
+    print("ERROR: pyvista not found!")
+    sys.exit(1)
 
-print("\n" + "=" * 60)
-print("POINT DATA (node-based fields):")
-print("=" * 60)
+import numpy as np
 
-if mesh.point_data:
-    for name in mesh.point_data.keys():
-        data = mesh.point_data[name]
-        if hasattr(data, 'shape'):
-            shape = data.shape
-            if len(shape) == 1:
-                print(f"\n  {name} (scalar)")
-                print(f"    Shape: {shape}")
-                print(f"    Range: [{data.min():.3e}, {data.max():.3e}]")
-                print(f"    Mean: {data.mean():.3e}")
-            elif len(shape) == 2:
-                print(f"\n  {name} (vector, {shape[1]} components)")
-                print(f"    Shape: {shape}")
-                magnitude = (data**2).sum(axis=1)**0.5
-                print(f"    Magnitude range: [{magnitude.min():.3e}, {magnitude.max():.3e}]")
-                print(f"    Component ranges:")
-                for i in range(shape[1]):
-                    print(f"      [{i}]: [{data[:,i].min():.3e}, {data[:,i].max():.3e}]")
-else:
-    print("  (none)")
-
-print("\n" + "=" * 60)
-print("CELL DATA (element-based fields):")
-print("=" * 60)
+# bottleneck is optional: faster NaN-aware reductions when installed
+try:
+    import bottleneck as bn
+    nanmin, nanmax, nanmean = bn.nanmin, bn.nanmax, bn.nanmean
+except ImportError:
+    nanmin, nanmax, nanmean = np.nanmin, np.nanmax, np.nanmean
 
-if mesh.cell_data:
-    for name in mesh.cell_data.keys():
-        data = mesh.cell_data[name]
-        if hasattr(data, 'shape'):
-            shape = data.shape
-            if len(shape) == 1:
-                print(f"\n  {name} (scalar)")
-                print(f"    Shape: {shape}")
-                print(f"    Range: [{data.min():.3e}, {data.max():.3e}]")
-            elif len(shape) == 2:
-                print(f"\n  {name} (vector, {shape[1]} components)")
-                print(f"    Shape: {shape}")
-else:
-    print("  (none)")
-
-print("\n" + "=" * 60)
-print("FIELD DATA (global metadata):")
 print("=" * 60)
-
-if mesh.field_data:
-    for name, value in mesh.field_data.items():
-        print(f"  {name}: {value}")
-else:
-    print("  (none)")
-
-print("\n" + "=" * 60)
-print("Array names available:")
+print(f"Inspecting: {vtu_file}")
 print("=" * 60)
-print("  ", mesh.array_names)
 
-print("\n" + "=" * 60)
+reader = pv.get_reader(vtu_file)
+point_array_names = list(reader.point_array_names)
+cell_array_names = list(reader.cell_array_names)
+
+
+def read_ascii_arrays(path):
+    """Parse every ASCII DataArray with one np.fromstring call per array.
+
+    Arrays in any other format (binary, appended) are left to VTK. Returns
+    None if the file cannot be walked as plain XML (raw appended data).
+    """
+    arrays = {'PointData': {}, 'CellData': {}}
+    try:
+        for _, elem in ET.iterparse(path):
+            if elem.tag in arrays:
+                for da in elem.iter('DataArray'):
+                    if da.get('format') != 'ascii':
+                        continue
+                    values = np.fromstring(da.text or '', sep=' ')
+                    ncomp = int(da.get('NumberOfComponents', 1))
+                    arrays[elem.tag][da.get('Name')] = values.reshape(-1, ncomp) if ncomp > 1 else values
+                elem.clear()
+    except ET.ParseError:
+        return None
+    return arrays
+
+
+# VTK's ASCII parser is slow, so ASCII arrays are decoded with numpy instead
+with open(vtu_file, 'rb') as f:
+    ascii_arrays = read_ascii_arrays(vtu_file) if b'format="ascii"' in f.read(65536) else None
+if ascii_arrays is None:
+    ascii_arrays = {'PointData': {}, 'CellData': {}}
+
+# One VTK pass reads the geometry plus every array numpy has not decoded
+for name in ascii_arrays['PointData']:
+    reader.disable_point_array(name)
+for name in ascii_arrays['CellData']:
+    reader.disable_cell_array(name)
+mesh = reader.read()
+
+
+def iter_point_arrays():
+    """Yield (name, array) per point array, dropping each once reported"""
+    for name in point_array_names:
+        if name in ascii_arrays['PointData']:
+            yield name, ascii_arrays['PointData'].pop(name)
+        else:
+            yield name, mesh.point_data.pop(name)
+
+
+def iter_cell_arrays():
+    """Yield (name, array) per cell array, dropping each once reported"""
+    for name in cell_array_names:
+        if name in ascii_arrays['CellData']:
+            yield name, ascii_arrays['CellData'].pop(name)
+        else:
+            yield name, mesh.cell_data.pop(name)
+
+
+# The report is collected in memory and written in one go rather than
+# through dozens of separate print() calls per array
+report = io.StringIO()
+try:
+    with contextlib.redirect_stdout(report):
+        print(f"\nFile size: {os.path.getsize(vtu_file)} bytes")
+        print(f"Number of points: {mesh.n_points}")
+        print(f"Number of cells: {mesh.n_cells}")
+        print(f"Bounds: {mesh.bounds}")
+
+        print("\n" + "=" * 60)
+        print("POINT DATA (node-based fields):")
+        print("=" * 60)
+
+        if point_array_names:
+            for name, data in iter_point_arrays():
+                if hasattr(data, 'shape'):
+                    shape = data.shape
+                    if len(shape) == 1:
+                        mn, mx, mean = nanmin(data), nanmax(data), nanmean(data)
+                        print(f"\n  {name} (scalar)\n"
+                              f"    Shape: {shape}\n"
+                              f"    Range: [{mn:.3e}, {mx:.3e}]\n"
+                              f"    Mean: {mean:.3e}")
+                    elif len(shape) == 2:
+                        magnitude = np.linalg.norm(data, axis=1)
+                        mag_min, mag_max = nanmin(magnitude), nanmax(magnitude)
+                        comp_min = nanmin(data, axis=0)
+                        comp_max = nanmax(data, axis=0)
+                        components = "\n".join(f"      [{i}]: [{lo:.3e}, {hi:.3e}]"
+                                                for i, (lo, hi) in enumerate(zip(comp_min, comp_max)))
+                        print(f"\n  {name} (vector, {shape[1]} components)\n"
+                              f"    Shape: {shape}\n"
+                              f"    Magnitude range: [{mag_min:.3e}, {mag_max:.3e}]\n"
+                              f"    Component ranges:\n"
+                              f"{components}")
+        else:
+            print("  (none)")
+
+        print("\n" + "=" * 60)
+        print("CELL DATA (element-based fields):")
+        print("=" * 60)
+
+        if cell_array_names:
+            for name, data in iter_cell_arrays():
+                if hasattr(data, 'shape'):
+                    shape = data.shape
+                    if len(shape) == 1:
+                        mn, mx = nanmin(data), nanmax(data)
+                        print(f"\n  {name} (scalar)\n"
+                              f"    Shape: {shape}\n"
+                              f"    Range: [{mn:.3e}, {mx:.3e}]")
+                    elif len(shape) == 2:
+                        print(f"\n  {name} (vector, {shape[1]} components)")
+                        print(f"    Shape: {shape}")
+        else:
+            print("  (none)")
+
+        print("\n" + "=" * 60)
+        print("FIELD DATA (global metadata):")
+        print("=" * 60)
+
+        if mesh.field_data:
+            for name, value in mesh.field_data.items():
+                print(f"  {name}: {value}")
+        else:
+            print("  (none)")
+
+        print("\n" + "=" * 60)
+        print("Array names available:")
+        print("=" * 60)
+        print("  ", point_array_names + cell_array_names + list(mesh.field_data.keys()))
+
+        print("\n" + "=" * 60)
+finally:
+    # Whatever was collected is printed even if an array fails mid-report
+    sys.stdout.write(report.getvalue())
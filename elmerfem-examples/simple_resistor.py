@@ -9,7 +9,11 @@ If this doesn't work, ElmerFEM solver has issues.
 
 import os
 import sys
+import hashlib
 import subprocess
+from pathlib import Path
+
+from elmer_mpi import mpi_settings
 
 try:
     import gmsh
@@ -20,6 +24,11 @@ except ImportError:
 sim_path = os.path.abspath('simple_resistor_sim')
 os.makedirs(sim_path, exist_ok=True)
 
+# Parallel run: partition the mesh with METIS and use ElmerSolver_mpi
+# when an MPI build is available, otherwise fall back to serial
+num_procs = os.cpu_count() or 1
+mpi_procs, use_mpi, partition_args = mpi_settings()
+
 print("=" * 60)
 print("ElmerFEM: Simple Resistor Test")
 print("=" * 60)
@@ -30,52 +39,82 @@ print("=" * 60)
 
 print("\n[1/4] Creating simple rectangle...")
 
-gmsh.initialize()
-gmsh.model.add("resistor")
-
 lc = 1.0  # Coarse mesh for speed
 
 # Simple 10mm x 2mm rectangle
-p1 = gmsh.model.geo.addPoint(0, 0, 0, lc)
-p2 = gmsh.model.geo.addPoint(0, 2, 0, lc)
-p3 = gmsh.model.geo.addPoint(10, 2, 0, lc)
-p4 = gmsh.model.geo.addPoint(10, 0, 0, lc)
+length = 10.0
+width = 2.0
+
+# Mesh cache: the file name carries a hash of the geometry, so an
+# unchanged geometry reuses the previous mesh instead of re-meshing
+mesh_key = hashlib.blake2b(repr((length, width, lc)).encode(), digest_size=8).hexdigest()
+mesh_file = os.path.join(sim_path, f"mesh_{mesh_key}.msh")
+
+# ElmerGrid output (or the directly written Elmer mesh) is reused when
+# sim_path already holds this mesh with the same partitioning
+grid_key = " ".join([mesh_key, *partition_args])
+grid_stamp = os.path.join(sim_path, "mesh.key")
+
+if os.path.exists(mesh_file):
+    print(f"  ✓ Reusing cached mesh: {os.path.basename(mesh_file)}")
+else:
+    gmsh.initialize()
+    gmsh.model.add("resistor")
+
+    surf = gmsh.model.occ.addRectangle(0, 0, 0, length, width)
+    gmsh.model.occ.synchronize()
+    gmsh.model.mesh.setSize(gmsh.model.getEntities(0), lc)
 
-l1 = gmsh.model.geo.addLine(p1, p2)
-l2 = gmsh.model.geo.addLine(p2, p3)
-l3 = gmsh.model.geo.addLine(p3, p4)
-l4 = gmsh.model.geo.addLine(p4, p1)
+    # Contact edges are picked out by position: x = 0 (left) and x = length (right)
+    eps = 1e-6
+    left = [tag for _, tag in gmsh.model.getEntitiesInBoundingBox(
+        -eps, -eps, -eps, eps, width + eps, eps, dim=1)]
+    right = [tag for _, tag in gmsh.model.getEntitiesInBoundingBox(
+        length - eps, -eps, -eps, length + eps, width + eps, eps, dim=1)]
 
-loop = gmsh.model.geo.addCurveLoop([l1, l2, l3, l4])
-surf = gmsh.model.geo.addPlaneSurface([loop])
+    gmsh.model.addPhysicalGroup(2, [surf], tag=1)
+    gmsh.model.setPhysicalName(2, 1, "Conductor")
 
-gmsh.model.geo.addPhysicalGroup(2, [surf], tag=1)
-gmsh.model.setPhysicalName(2, 1, "Conductor")
+    gmsh.model.addPhysicalGroup(1, left, tag=2)
+    gmsh.model.setPhysicalName(1, 2, "Left")
 
-gmsh.model.geo.addPhysicalGroup(1, [l1], tag=2)
-gmsh.model.setPhysicalName(1, 2, "Left")
+    gmsh.model.addPhysicalGroup(1, right, tag=3)
+    gmsh.model.setPhysicalName(1, 3, "Right")
 
-gmsh.model.geo.addPhysicalGroup(1, [l3], tag=3)
-gmsh.model.setPhysicalName(1, 3, "Right")
+    # Frontal-Delaunay 2D algorithm, meshing surfaces in parallel
+    gmsh.option.setNumber("Mesh.Algorithm", 6)
+    gmsh.option.setNumber("General.NumThreads", num_procs)
+    gmsh.model.mesh.generate(2)
 
-gmsh.model.geo.synchronize()
-gmsh.model.mesh.generate(2)
+    gmsh.write(mesh_file)
 
-mesh_file = os.path.join(sim_path, "mesh.msh")
-gmsh.write(mesh_file)
-print(f"  ✓ Created mesh")
+    # Serial runs need no partitioning, so the Elmer mesh is written straight
+    # from the gmsh model and the ElmerGrid step below is skipped
+    if not partition_args:
+        from elmer_mesh import write_elmer_mesh  # pulls in numpy, only needed here
+        write_elmer_mesh(sim_path)
+        with open(grid_stamp, 'w') as f:
+            f.write(grid_key)
+    print(f"  ✓ Created mesh")
 
-gmsh.finalize()
+    gmsh.finalize()
 
 # ========================================================================
 # 2. Convert
 # ========================================================================
 
 print("\n[2/4] Converting...")
-subprocess.run([
-    "ElmerGrid", "14", "2", mesh_file, "-out", sim_path
-], capture_output=True, timeout=30)
-print("  ✓ Converted")
+
+if os.path.exists(grid_stamp) and Path(grid_stamp).read_text() == grid_key:
+    print("  ✓ Reusing converted mesh")
+else:
+    result = subprocess.run([
+        "ElmerGrid", "14", "2", mesh_file, "-out", sim_path, *partition_args
+    ], capture_output=True, timeout=30)
+    if result.returncode == 0:
+        with open(grid_stamp, 'w') as f:
+            f.write(grid_key)
+    print("  ✓ Converted")
 
 # ========================================================================
 # 3. Minimal SIF file
@@ -92,7 +131,6 @@ Simulation
   Coordinate System = Cartesian 2D
   Simulation Type = Steady State
   Steady State Max Iterations = 1
-  Post File = "result.vtu"
 End
 
 Body 1
@@ -101,7 +139,7 @@ Body 1
 End
 
 Equation 1
-  Active Solvers(1) = 1
+  Active Solvers(2) = 1 2
 End
 
 Material 1
@@ -117,8 +155,11 @@ Solver 1
   Calculate Current Density = True
 
   Linear System Solver = Iterative
-  Linear System Iterative Method = BiCGStab
-  Linear System Preconditioning = ILU1
+  Linear System Iterative Method = GCR
+  Linear System Preconditioning = multigrid
+  MG Method = Algebraic
+  MG Levels = 10
+  MG Smoother = SGS
   Linear System Max Iterations = 1000
   Linear System Convergence Tolerance = 1.0e-6
   Linear System Residual Output = 10
@@ -126,6 +167,20 @@ Solver 1
   Steady State Convergence Tolerance = 1.0e-5
 End
 
+! Save all fields to VTU (binary, single precision)
+Solver 2
+  Exec Solver = After Timestep
+  Equation = "ResultOutput"
+  Procedure = "ResultOutputSolve" "ResultOutputSolver"
+  Output File Name = "result"
+  Vtu Format = Logical True
+  Binary Output = Logical True
+  Single Precision = Logical True
+  Vtu Part Collection = Logical True
+  Vtu Time Collection = Logical True
+  Save Geometry Ids = Logical True
+End
+
 Boundary Condition 1
   Target Boundaries(1) = 2
   Potential = 1.0
@@ -150,8 +205,10 @@ print("\n[4/4] Running ElmerSolver...")
 print("  (Showing full output for debugging)")
 print("")
 
+solver_cmd = (["mpirun", "-np", str(mpi_procs), "ElmerSolver_mpi", "case.sif"] if use_mpi
+              else ["ElmerSolver", "case.sif"])
 result = subprocess.run(
-    ["ElmerSolver", "case.sif"],
+    solver_cmd,
     cwd=sim_path,
     text=True,
     timeout=60
@@ -161,7 +218,7 @@ print("")
 if result.returncode == 0:
     print("  ✓ SUCCESS!")
 
-    vtu_files = [f for f in os.listdir(sim_path) if f.endswith('.vtu')]
+    vtu_files = [e.name for e in os.scandir(sim_path) if e.name.endswith('.vtu')]
     if vtu_files:
         print(f"  ✓ Created: {vtu_files[0]}")
     else:
@@ -13,13 +13,15 @@ This demonstrates ElmerFEM for DC current flow analysis.
 
 import os
 import sys
+import hashlib
 import subprocess
-import numpy as np
+from pathlib import Path
+
+from elmer_mpi import mpi_settings
 
 # Check if running in container
 try:
     import gmsh
-    import meshio
 except ImportError:
     print("ERROR: Required packages not found!")
     print("Make sure you're running in the ElmerFEM container")
@@ -39,6 +41,11 @@ voltage_applied = 5.0    # 5V DC
 sim_path = os.path.abspath('tapered_trace_sim')
 os.makedirs(sim_path, exist_ok=True)
 
+# Parallel run: partition the mesh with METIS and use ElmerSolver_mpi
+# when an MPI build is available, otherwise fall back to serial
+num_procs = os.cpu_count() or 1
+mpi_procs, use_mpi, partition_args = mpi_settings()
+
 print("=" * 60)
 print("ElmerFEM: Tapered PCB Trace Analysis")
 print("=" * 60)
@@ -52,94 +59,87 @@ print(f"Output directory: {sim_path}/")
 
 print("\n[1/4] Creating geometry with Gmsh...")
 
-gmsh.initialize()
-gmsh.model.add("tapered_trace")
-
 # Mesh size
 lc = 0.5  # Mesh characteristic length in mm
 
-# Create tapered trace as a 3D box with varying width
-# We'll create it as a lofted solid
-
-# Bottom face (wide end)
-p1 = gmsh.model.geo.addPoint(0, -trace_width_start/2, 0, lc)
-p2 = gmsh.model.geo.addPoint(0, trace_width_start/2, 0, lc)
-p3 = gmsh.model.geo.addPoint(0, trace_width_start/2, trace_thickness, lc)
-p4 = gmsh.model.geo.addPoint(0, -trace_width_start/2, trace_thickness, lc)
-
-l1 = gmsh.model.geo.addLine(p1, p2)
-l2 = gmsh.model.geo.addLine(p2, p3)
-l3 = gmsh.model.geo.addLine(p3, p4)
-l4 = gmsh.model.geo.addLine(p4, p1)
-
-face1 = gmsh.model.geo.addCurveLoop([l1, l2, l3, l4])
-surf1 = gmsh.model.geo.addPlaneSurface([face1])
-
-# Top face (narrow end)
-p5 = gmsh.model.geo.addPoint(trace_length, -trace_width_end/2, 0, lc)
-p6 = gmsh.model.geo.addPoint(trace_length, trace_width_end/2, 0, lc)
-p7 = gmsh.model.geo.addPoint(trace_length, trace_width_end/2, trace_thickness, lc)
-p8 = gmsh.model.geo.addPoint(trace_length, -trace_width_end/2, trace_thickness, lc)
-
-l5 = gmsh.model.geo.addLine(p5, p6)
-l6 = gmsh.model.geo.addLine(p6, p7)
-l7 = gmsh.model.geo.addLine(p7, p8)
-l8 = gmsh.model.geo.addLine(p8, p5)
-
-face2 = gmsh.model.geo.addCurveLoop([l5, l6, l7, l8])
-surf2 = gmsh.model.geo.addPlaneSurface([face2])
-
-# Connect the two faces
-l9 = gmsh.model.geo.addLine(p1, p5)
-l10 = gmsh.model.geo.addLine(p2, p6)
-l11 = gmsh.model.geo.addLine(p3, p7)
-l12 = gmsh.model.geo.addLine(p4, p8)
-
-# Side surfaces
-side1_loop = gmsh.model.geo.addCurveLoop([l1, l10, -l5, -l9])
-side1 = gmsh.model.geo.addPlaneSurface([side1_loop])
-
-side2_loop = gmsh.model.geo.addCurveLoop([l2, l11, -l6, -l10])
-side2 = gmsh.model.geo.addPlaneSurface([side2_loop])
-
-side3_loop = gmsh.model.geo.addCurveLoop([l3, l12, -l7, -l11])
-side3 = gmsh.model.geo.addPlaneSurface([side3_loop])
-
-side4_loop = gmsh.model.geo.addCurveLoop([l4, l9, -l8, -l12])
-side4 = gmsh.model.geo.addPlaneSurface([side4_loop])
-
-# Create volume
-shell = gmsh.model.geo.addSurfaceLoop([surf1, surf2, side1, side2, side3, side4])
-volume = gmsh.model.geo.addVolume([shell])
-
-# Physical groups for boundary conditions and material
-gmsh.model.geo.addPhysicalGroup(3, [volume], tag=1)  # Copper volume
-gmsh.model.setPhysicalName(3, 1, "Copper")
-
-gmsh.model.geo.addPhysicalGroup(2, [surf1], tag=2)  # Input (wide end)
-gmsh.model.setPhysicalName(2, 2, "Input")
-
-gmsh.model.geo.addPhysicalGroup(2, [surf2], tag=3)  # Output (narrow end)
-gmsh.model.setPhysicalName(2, 3, "Output")
-
-gmsh.model.geo.synchronize()
-
-# Generate mesh
-gmsh.model.mesh.generate(3)
-
-# Save mesh
-mesh_file = os.path.join(sim_path, "trace.msh")
-gmsh.write(mesh_file)
-
-print(f"  ✓ Mesh created: {mesh_file}")
-
-# Get mesh info
-nodes = gmsh.model.mesh.getNodes()
-elements = gmsh.model.mesh.getElements()
-print(f"  Nodes: {len(nodes[0])}")
-print(f"  Elements: {sum(len(e) for e in elements[1])}")
-
-gmsh.finalize()
+# Mesh cache: the file name carries a hash of the geometry, so an
+# unchanged geometry reuses the previous mesh instead of re-meshing
+mesh_key = hashlib.blake2b(
+    repr((trace_length, trace_width_start, trace_width_end, trace_thickness, lc)).encode(),
+    digest_size=8).hexdigest()
+mesh_file = os.path.join(sim_path, f"trace_{mesh_key}.msh")
+
+# ElmerGrid output (or the directly written Elmer mesh) is reused when
+# sim_path already holds this mesh with the same partitioning
+grid_key = " ".join([mesh_key, *partition_args])
+grid_stamp = os.path.join(sim_path, "mesh.key")
+
+if os.path.exists(mesh_file):
+    print(f"  ✓ Reusing cached mesh: {mesh_file}")
+else:
+    gmsh.initialize()
+    gmsh.model.add("tapered_trace")
+
+    # Create tapered trace as a 3D solid: the tapered outline (top view)
+    # is built once in the OCC kernel and extruded through the thickness
+    p1 = gmsh.model.occ.addPoint(0, -trace_width_start/2, 0)
+    p2 = gmsh.model.occ.addPoint(0, trace_width_start/2, 0)
+    p3 = gmsh.model.occ.addPoint(trace_length, trace_width_end/2, 0)
+    p4 = gmsh.model.occ.addPoint(trace_length, -trace_width_end/2, 0)
+
+    edges = [gmsh.model.occ.addLine(a, b) for a, b in [(p1, p2), (p2, p3), (p3, p4), (p4, p1)]]
+    outline = gmsh.model.occ.addPlaneSurface([gmsh.model.occ.addCurveLoop(edges)])
+
+    extruded = gmsh.model.occ.extrude([(2, outline)], 0, 0, trace_thickness)
+    volume = next(tag for dim, tag in extruded if dim == 3)
+
+    gmsh.model.occ.synchronize()
+    gmsh.model.mesh.setSize(gmsh.model.getEntities(0), lc)
+
+    # End faces are picked out by position: x = 0 (wide) and x = trace_length (narrow)
+    eps = 1e-6
+    surf1 = [tag for _, tag in gmsh.model.getEntitiesInBoundingBox(
+        -eps, -trace_width_start, -eps, eps, trace_width_start, trace_thickness + eps, dim=2)]
+    surf2 = [tag for _, tag in gmsh.model.getEntitiesInBoundingBox(
+        trace_length - eps, -trace_width_start, -eps,
+        trace_length + eps, trace_width_start, trace_thickness + eps, dim=2)]
+
+    # Physical groups for boundary conditions and material
+    gmsh.model.addPhysicalGroup(3, [volume], tag=1)  # Copper volume
+    gmsh.model.setPhysicalName(3, 1, "Copper")
+
+    gmsh.model.addPhysicalGroup(2, surf1, tag=2)  # Input (wide end)
+    gmsh.model.setPhysicalName(2, 2, "Input")
+
+    gmsh.model.addPhysicalGroup(2, surf2, tag=3)  # Output (narrow end)
+    gmsh.model.setPhysicalName(2, 3, "Output")
+
+    # Generate mesh with the multi-threaded HXT 3D algorithm
+    gmsh.option.setNumber("Mesh.Algorithm3D", 10)  # HXT
+    gmsh.option.setNumber("General.NumThreads", num_procs)
+    gmsh.option.setNumber("Mesh.MaxNumThreads3D", num_procs)
+    gmsh.model.mesh.generate(3)
+
+    # Save mesh as MSH 2.2 for ElmerGrid; binary is opt-in (ELMER_BINARY_MSH=1)
+    gmsh.option.setNumber("Mesh.MshFileVersion", 2.2)
+    gmsh.option.setNumber("Mesh.Binary", 1 if os.environ.get("ELMER_BINARY_MSH") == "1" else 0)
+    gmsh.write(mesh_file)
+
+    # Serial runs need no partitioning, so the Elmer mesh is written straight
+    # from the gmsh model and the ElmerGrid step below is skipped
+    if not partition_args:
+        from elmer_mesh import write_elmer_mesh  # pulls in numpy, only needed here
+        write_elmer_mesh(sim_path)
+        with open(grid_stamp, 'w') as f:
+            f.write(grid_key)
+
+    print(f"  ✓ Mesh created: {mesh_file}")
+
+    # Mesh statistics are counted inside gmsh, without copying the mesh out
+    print(f"  Nodes: {int(gmsh.option.getNumber('Mesh.NbNodes'))}")
+    print(f"  Elements: {int(gmsh.option.getNumber('Mesh.NbTetrahedra'))}")
+
+    gmsh.finalize()
 
 # ========================================================================
 # 2. Convert mesh for ElmerFEM
@@ -151,18 +151,24 @@ print("\n[2/4] Converting mesh for ElmerFEM...")
 elmergrid_cmd = [
     "ElmerGrid", "14", "2",
     mesh_file,
-    "-out", sim_path
+    "-out", sim_path,
+    *partition_args
 ]
 
-try:
-    result = subprocess.run(elmergrid_cmd, capture_output=True, text=True, timeout=30)
-    if result.returncode == 0:
-        print("  ✓ Mesh converted to Elmer format")
-    else:
-        print("  ⚠ ElmerGrid warning:", result.stderr)
-except Exception as e:
-    print(f"  ✗ ElmerGrid failed: {e}")
-    sys.exit(1)
+if os.path.exists(grid_stamp) and Path(grid_stamp).read_text() == grid_key:
+    print("  ✓ Reusing converted mesh")
+else:
+    try:
+        result = subprocess.run(elmergrid_cmd, capture_output=True, text=True, timeout=30)
+        if result.returncode == 0:
+            with open(grid_stamp, 'w') as f:
+                f.write(grid_key)
+            print("  ✓ Mesh converted to Elmer format")
+        else:
+            print("  ⚠ ElmerGrid warning:", result.stderr)
+    except Exception as e:
+        print(f"  ✗ ElmerGrid failed: {e}")
+        sys.exit(1)
 
 # ========================================================================
 # 3. Create ElmerFEM Solver Input File (.sif)
@@ -170,7 +176,8 @@ except Exception as e:
 
 print("\n[3/4] Creating ElmerFEM solver file...")
 
-sif_content = f"""!
+# SIF template; parameters are filled in with format_map below
+SIF_TEMPLATE = """!
 ! ElmerFEM Solver Input File
 ! Tapered PCB Trace - Current Flow Analysis
 !
@@ -186,7 +193,6 @@ Simulation
   Simulation Type = Steady State
   Steady State Max Iterations = 1
   Output Intervals = 1
-  Post File = "trace_results.vtu"
 End
 
 Constants
@@ -202,7 +208,7 @@ End
 
 Equation 1
   Name = "Current Conduction"
-  Active Solvers(1) = 1
+  Active Solvers(2) = 1 2
 End
 
 Material 1
@@ -223,8 +229,11 @@ Solver 1
   Calculate Joule Heating = True
 
   Linear System Solver = Iterative
-  Linear System Iterative Method = BiCGStab
-  Linear System Preconditioning = ILU0
+  Linear System Iterative Method = GCR
+  Linear System Preconditioning = multigrid
+  MG Method = Algebraic
+  MG Levels = 10
+  MG Smoother = SGS
   Linear System Max Iterations = 500
   Linear System Convergence Tolerance = 1.0e-8
 
@@ -234,6 +243,20 @@ Solver 1
   Steady State Convergence Tolerance = 1.0e-6
 End
 
+! Save all fields to VTU (binary, single precision)
+Solver 2
+  Exec Solver = After Timestep
+  Equation = "ResultOutput"
+  Procedure = "ResultOutputSolve" "ResultOutputSolver"
+  Output File Name = "trace_results"
+  Vtu Format = Logical True
+  Binary Output = Logical True
+  Single Precision = Logical True
+  Vtu Part Collection = Logical True
+  Vtu Time Collection = Logical True
+  Save Geometry Ids = Logical True
+End
+
 ! Boundary Condition: Input (wide end) - Apply voltage
 Boundary Condition 1
   Target Boundaries(1) = 2
@@ -249,8 +272,10 @@ Boundary Condition 2
 End
 """
 
+sif_content = SIF_TEMPLATE.format_map({'voltage_applied': voltage_applied})
+
 sif_file = os.path.join(sim_path, "trace.sif")
-with open(sif_file, 'w') as f:
+with open(sif_file, 'w', buffering=65536) as f:
     f.write(sif_content)
 
 print(f"  ✓ Solver file created: {sif_file}")
@@ -262,34 +287,37 @@ print(f"  ✓ Solver file created: {sif_file}")
 print("\n[4/4] Running ElmerSolver...")
 print("  (This may take 10-30 seconds...)")
 
-solver_cmd = ["ElmerSolver", "trace.sif"]
+solver_cmd = (["mpirun", "-np", str(mpi_procs), "ElmerSolver_mpi", "trace.sif"] if use_mpi
+              else ["ElmerSolver", "trace.sif"])
+
+# Solver output goes straight to a log file rather than a pipe, so a long
+# run is never held up by a full pipe buffer or kept in Python memory
+solver_log = os.path.join(sim_path, "solver.log")
 
 try:
-    result = subprocess.run(
-        solver_cmd,
-        cwd=sim_path,
-        capture_output=True,
-        text=True,
-        timeout=120
-    )
+    with open(solver_log, 'w') as log:
+        result = subprocess.run(
+            solver_cmd,
+            cwd=sim_path,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            timeout=120
+        )
 
     if result.returncode == 0:
         print("  ✓ Solver completed successfully!")
 
-        # Check for output file
-        vtu_file = os.path.join(sim_path, "trace_results.vtu")
-        if os.path.exists(vtu_file):
-            file_size = os.path.getsize(vtu_file)
-            print(f"  ✓ Results file: trace_results.vtu ({file_size} bytes)")
-        else:
-            # Try alternative output name
-            vtu_file = os.path.join(sim_path, "trace_results0001.vtu")
-            if os.path.exists(vtu_file):
-                file_size = os.path.getsize(vtu_file)
-                print(f"  ✓ Results file: trace_results0001.vtu ({file_size} bytes)")
+        # Check for output file (ResultOutputSolver appends a timestep suffix)
+        for entry in os.scandir(sim_path):
+            if entry.name.startswith("trace_results") and entry.name.endswith(".vtu"):
+                print(f"  ✓ Results file: {entry.name} ({entry.stat().st_size} bytes)")
+                break
     else:
         print("  ⚠ Solver completed with warnings")
-        print(result.stderr[:500])
+        with open(solver_log, 'rb') as f:
+            f.seek(max(0, os.path.getsize(solver_log) - 500))
+            print(f.read().decode(errors='replace'))
+        print(f"  Full log: {solver_log}")
 
 except Exception as e:
     print(f"  ✗ Solver failed: {e}")
@@ -305,7 +333,7 @@ print("=" * 60)
 print(f"\nResults directory: {sim_path}/")
 print("\nOutput files:")
 print("  - trace_results*.vtu (ParaView visualization)")
-print("  - trace.msh (Gmsh mesh)")
+print("  - trace_*.msh (Gmsh mesh, cached by geometry hash)")
 print("\nTo visualize in ParaView:")
 print("  1. Open trace_results*.vtu file")
 print("  2. Click Apply")
@@ -8,7 +8,11 @@ Uses direct solver for guaranteed convergence.
 
 import os
 import sys
+import hashlib
 import subprocess
+from pathlib import Path
+
+from elmer_mpi import mpi_settings
 
 try:
     import gmsh
@@ -19,6 +23,11 @@ except ImportError:
 sim_path = os.path.abspath('tapered_working_sim')
 os.makedirs(sim_path, exist_ok=True)
 
+# Parallel run: partition the mesh with METIS and use ElmerSolver_mpi
+# when an MPI build is available, otherwise fall back to serial
+num_procs = os.cpu_count() or 1
+mpi_procs, use_mpi, partition_args = mpi_settings()
+
 print("=" * 60)
 print("ElmerFEM: Tapered Trace (Direct Solver)")
 print("=" * 60)
@@ -29,54 +38,88 @@ print("=" * 60)
 
 print("\n[1/4] Creating geometry...")
 
-gmsh.initialize()
-gmsh.model.add("tapered")
-
 lc = 0.5  # Moderate mesh size
 
 # 2D tapered trace: 4mm → 1mm over 15mm
-p1 = gmsh.model.geo.addPoint(0, 0, 0, lc)
-p2 = gmsh.model.geo.addPoint(0, 4, 0, lc)
-p3 = gmsh.model.geo.addPoint(15, 1, 0, lc)
-p4 = gmsh.model.geo.addPoint(15, 0, 0, lc)
+trace_length = 15.0
+width_start = 4.0
+width_end = 1.0
+
+# Mesh cache: the file name carries a hash of the geometry, so an
+# unchanged geometry reuses the previous mesh instead of re-meshing
+mesh_key = hashlib.blake2b(repr((trace_length, width_start, width_end, lc)).encode(),
+                           digest_size=8).hexdigest()
+mesh_file = os.path.join(sim_path, f"mesh_{mesh_key}.msh")
+
+# ElmerGrid output (or the directly written Elmer mesh) is reused when
+# sim_path already holds this mesh with the same partitioning
+grid_key = " ".join([mesh_key, *partition_args])
+grid_stamp = os.path.join(sim_path, "mesh.key")
+
+if os.path.exists(mesh_file):
+    print(f"  ✓ Reusing cached mesh: {os.path.basename(mesh_file)}")
+else:
+    gmsh.initialize()
+    gmsh.model.add("tapered")
+
+    p1 = gmsh.model.geo.addPoint(0, 0, 0, lc)
+    p2 = gmsh.model.geo.addPoint(0, width_start, 0, lc)
+    p3 = gmsh.model.geo.addPoint(trace_length, width_end, 0, lc)
+    p4 = gmsh.model.geo.addPoint(trace_length, 0, 0, lc)
 
-l1 = gmsh.model.geo.addLine(p1, p2)
-l2 = gmsh.model.geo.addLine(p2, p3)
-l3 = gmsh.model.geo.addLine(p3, p4)
-l4 = gmsh.model.geo.addLine(p4, p1)
+    l1 = gmsh.model.geo.addLine(p1, p2)
+    l2 = gmsh.model.geo.addLine(p2, p3)
+    l3 = gmsh.model.geo.addLine(p3, p4)
+    l4 = gmsh.model.geo.addLine(p4, p1)
 
-loop = gmsh.model.geo.addCurveLoop([l1, l2, l3, l4])
-surf = gmsh.model.geo.addPlaneSurface([loop])
+    loop = gmsh.model.geo.addCurveLoop([l1, l2, l3, l4])
+    surf = gmsh.model.geo.addPlaneSurface([loop])
 
-gmsh.model.geo.addPhysicalGroup(2, [surf], tag=1)
-gmsh.model.setPhysicalName(2, 1, "Conductor")
+    gmsh.model.geo.addPhysicalGroup(2, [surf], tag=1)
+    gmsh.model.setPhysicalName(2, 1, "Conductor")
 
-gmsh.model.geo.addPhysicalGroup(1, [l1], tag=2)
-gmsh.model.setPhysicalName(1, 2, "Input")
+    gmsh.model.geo.addPhysicalGroup(1, [l1], tag=2)
+    gmsh.model.setPhysicalName(1, 2, "Input")
 
-gmsh.model.geo.addPhysicalGroup(1, [l3], tag=3)
-gmsh.model.setPhysicalName(1, 3, "Output")
+    gmsh.model.geo.addPhysicalGroup(1, [l3], tag=3)
+    gmsh.model.setPhysicalName(1, 3, "Output")
 
-gmsh.model.geo.synchronize()
-gmsh.model.mesh.generate(2)
+    gmsh.model.geo.synchronize()
+    # Frontal-Delaunay 2D algorithm, meshing surfaces in parallel
+    gmsh.option.setNumber("Mesh.Algorithm", 6)
+    gmsh.option.setNumber("General.NumThreads", num_procs)
+    gmsh.model.mesh.generate(2)
 
-mesh_file = os.path.join(sim_path, "mesh.msh")
-gmsh.write(mesh_file)
+    gmsh.write(mesh_file)
 
-nodes = gmsh.model.mesh.getNodes()
-print(f"  ✓ Created mesh with {len(nodes[0])} nodes")
+    # Serial runs need no partitioning, so the Elmer mesh is written straight
+    # from the gmsh model and the ElmerGrid step below is skipped
+    if not partition_args:
+        from elmer_mesh import write_elmer_mesh  # pulls in numpy, only needed here
+        write_elmer_mesh(sim_path)
+        with open(grid_stamp, 'w') as f:
+            f.write(grid_key)
 
-gmsh.finalize()
+    print(f"  ✓ Created mesh with {int(gmsh.option.getNumber('Mesh.NbNodes'))} nodes")
+
+    gmsh.finalize()
 
 # ========================================================================
 # Convert
 # ========================================================================
 
 print("\n[2/4] Converting...")
-subprocess.run([
-    "ElmerGrid", "14", "2", mesh_file, "-out", sim_path
-], capture_output=True, timeout=30)
-print("  ✓ Converted")
+
+if os.path.exists(grid_stamp) and Path(grid_stamp).read_text() == grid_key:
+    print("  ✓ Reusing converted mesh")
+else:
+    result = subprocess.run([
+        "ElmerGrid", "14", "2", mesh_file, "-out", sim_path, *partition_args
+    ], capture_output=True, timeout=30)
+    if result.returncode == 0:
+        with open(grid_stamp, 'w') as f:
+            f.write(grid_key)
+    print("  ✓ Converted")
 
 # ========================================================================
 # Create SIF with DIRECT solver
@@ -84,7 +127,10 @@ print("  ✓ Converted")
 
 print("\n[3/4] Creating solver file...")
 
-sif_content = """
+# UMFPack is serial-only in Elmer; MPI runs use the parallel direct solver
+direct_method = "MUMPS" if use_mpi else "UMFPack"
+
+sif_content = f"""
 Header
   Mesh DB "." "."
 End
@@ -93,7 +139,6 @@ Simulation
   Coordinate System = Cartesian 2D
   Simulation Type = Steady State
   Steady State Max Iterations = 1
-  Post File = "tapered_result.vtu"
 End
 
 Body 1
@@ -124,18 +169,22 @@ Solver 1
 
   ! Use DIRECT solver - guaranteed to converge
   Linear System Solver = Direct
-  Linear System Direct Method = UMFPack
+  Linear System Direct Method = {direct_method}
 
   Steady State Convergence Tolerance = 1.0e-5
 End
 
-! Save all fields to VTU
+! Save all fields to VTU (binary, single precision)
 Solver 2
   Exec Solver = After Timestep
   Equation = "ResultOutput"
   Procedure = "ResultOutputSolve" "ResultOutputSolver"
   Output File Name = "tapered_result"
   Vtu Format = Logical True
+  Binary Output = Logical True
+  Single Precision = Logical True
+  Vtu Part Collection = Logical True
+  Vtu Time Collection = Logical True
   Save Geometry Ids = Logical True
 End
 
@@ -161,8 +210,10 @@ print("  ✓ SIF created")
 
 print("\n[4/4] Running ElmerSolver...")
 
+solver_cmd = (["mpirun", "-np", str(mpi_procs), "ElmerSolver_mpi", "case.sif"] if use_mpi
+              else ["ElmerSolver", "case.sif"])
 result = subprocess.run(
-    ["ElmerSolver", "case.sif"],
+    solver_cmd,
     cwd=sim_path,
     capture_output=True,
     text=True,
@@ -172,7 +223,7 @@ result = subprocess.run(
 if "ELMER SOLVER FINISHED" in result.stdout or "ALL DONE" in result.stdout:
     print("  ✓ Solver completed!")
 
-    vtu_files = [f for f in os.listdir(sim_path) if f.endswith('.vtu')]
+    vtu_files = [e.name for e in os.scandir(sim_path) if e.name.endswith('.vtu')]
     if vtu_files:
         vtu_file = vtu_files[0]
         file_size = os.path.getsize(os.path.join(sim_path, vtu_file))
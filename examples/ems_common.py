@@ -0,0 +1,37 @@
+"""
+Run helpers shared by the openEMS examples
+==========================================
+
+The progress output is block-buffered and flushed before the openEMS engine
+writes to the same terminal. A run is skipped when sim_path still holds the
+results of the identical setup: the complete setup XML (geometry, mesh,
+excitation, dumps) is hashed and the hash is stamped into sim_path/run.key
+after a successful run, since FDTD.Run(cleanup=True) empties sim_path first.
+"""
+
+import os
+import sys
+import hashlib
+from pathlib import Path
+
+
+def buffer_stdout():
+    """Block-buffer stdout instead of flushing every line"""
+    sys.stdout.reconfigure(line_buffering=False)
+
+
+def results_current(FDTD, sim_path):
+    """Write sim_path/setup.xml and return (current, run_key), where current
+    is True when sim_path holds the results of exactly this setup"""
+    setup_xml = os.path.join(sim_path, 'setup.xml')
+    FDTD.Write2XML(setup_xml)
+    run_key = hashlib.sha256(Path(setup_xml).read_bytes()).hexdigest()[:16]
+    run_stamp = Path(sim_path, 'run.key')
+    return run_stamp.exists() and run_stamp.read_text() == run_key, run_key
+
+
+def run_fdtd(FDTD, sim_path, run_key):
+    """Run openEMS in sim_path and stamp the results with run_key"""
+    sys.stdout.flush()
+    FDTD.Run(sim_path, cleanup=True, verbose=2)
+    Path(sim_path, 'run.key').write_text(run_key)
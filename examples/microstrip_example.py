@@ -11,14 +11,21 @@ Physical Setup:
 - Ground plane: Copper (bottom of substrate)
 
 The simulation calculates S-parameters to verify transmission line behavior.
+The plots are written to microstrip_simulation/results.png (no window is opened,
+so the script runs unchanged in headless containers).
 """
 
 import os
+import math
 import numpy as np
 from CSXCAD import ContinuousStructure
 from openEMS import openEMS
 from openEMS.physical_constants import C0, EPS0, MUE0
 
+from ems_common import buffer_stdout, results_current, run_fdtd
+
+buffer_stdout()
+
 # ============================================================================
 # Simulation Parameters
 # ============================================================================
@@ -93,10 +100,11 @@ sub_y = [0, substrate_length]
 sub_z = [0, substrate_height]
 
 # Create substrate box
+# IMPORTANT: Use mesh coordinates (NOT SI units!) - SetDeltaUnit scales them
 substrate.AddBox(
     priority=0,
-    start=[sub_x[0] * unit, sub_y[0] * unit, sub_z[0] * unit],
-    stop=[sub_x[1] * unit, sub_y[1] * unit, sub_z[1] * unit]
+    start=[sub_x[0], sub_y[0], sub_z[0]],
+    stop=[sub_x[1], sub_y[1], sub_z[1]]
 )
 
 print(f"  Substrate: {substrate_width} × {substrate_length} × {substrate_height} mm")
@@ -104,26 +112,28 @@ print(f"  Substrate: {substrate_width} × {substrate_length} × {substrate_heigh
 # Ground plane (bottom of substrate)
 copper.AddBox(
     priority=10,
-    start=[sub_x[0] * unit, sub_y[0] * unit, 0],
-    stop=[sub_x[1] * unit, sub_y[1] * unit, 0]
+    start=[sub_x[0], sub_y[0], 0],
+    stop=[sub_x[1], sub_y[1], 0]
 )
 
 print(f"  Ground plane: {substrate_width} × {substrate_length} mm")
 
 # Microstrip trace (centered on substrate)
 trace_x_center = substrate_width / 2.0
+trace_x_left = trace_x_center - trace_width / 2.0
+trace_x_right = trace_x_center + trace_width / 2.0
 trace_y_start = (substrate_length - trace_length) / 2.0
 trace_y_stop = trace_y_start + trace_length
 
 trace_start = [
-    (trace_x_center - trace_width / 2.0) * unit,
-    trace_y_start * unit,
-    substrate_height * unit
+    trace_x_left,
+    trace_y_start,
+    substrate_height
 ]
 trace_stop = [
-    (trace_x_center + trace_width / 2.0) * unit,
-    trace_y_stop * unit,
-    (substrate_height + trace_thickness) * unit
+    trace_x_right,
+    trace_y_stop,
+    substrate_height + trace_thickness
 ]
 
 copper.AddBox(priority=10, start=trace_start, stop=trace_stop)
@@ -142,16 +152,20 @@ mesh.SetDeltaUnit(unit)
 
 # Define mesh regions with appropriate resolution
 # Add explicit lines at port locations for proper port snapping
-mesh.AddLine('x', [0, substrate_width / 2.0 - trace_width / 2.0, substrate_width / 2.0, substrate_width / 2.0 + trace_width / 2.0, substrate_width])
-# Add y-mesh with explicit lines at port locations
-mesh.AddLine('y', np.linspace(0, substrate_length, int(substrate_length / mesh_res) + 1))
-mesh.AddLine('y', [trace_y_start, trace_y_stop])  # Explicit port locations
+mesh.AddLine('x', [0, trace_x_left, trace_x_center, trace_x_right, substrate_width])
+# Add y-mesh with explicit lines at port locations, in a single call
+n_y = math.ceil(substrate_length / mesh_res) + 1  # spacing never exceeds mesh_res
+y_lines = np.union1d(np.linspace(0, substrate_length, n_y), [trace_y_start, trace_y_stop])
+mesh.AddLine('y', y_lines)
 # Add explicit z-lines at ground and substrate top for ports
 mesh.AddLine('z', [0, substrate_height, substrate_height + trace_thickness])
 
 # Smooth mesh
 mesh.SmoothMeshLines('x', mesh_res, 1.3)
-mesh.SmoothMeshLines('y', mesh_res, 1.3)
+# The y-lines are already uniform; smoothing only adds lines where a gap
+# exceeds mesh_res, so skip it when no gap does
+if np.diff(y_lines).max() > mesh_res * (1 + 1e-9):
+    mesh.SmoothMeshLines('y', mesh_res, 1.3)
 mesh.SmoothMeshLines('z', mesh_res / 4.0, 1.3)
 
 # ============================================================================
@@ -163,28 +177,28 @@ print("\nSetting up ports...")
 # Port 1 (input) - at beginning of trace
 # Use lumped ports for simplicity (vertical from ground to trace)
 port1_start = [
-    trace_x_center * unit,
-    trace_y_start * unit,
+    trace_x_center,
+    trace_y_start,
     0
 ]
 port1_stop = [
-    trace_x_center * unit,
-    trace_y_start * unit,
-    substrate_height * unit
+    trace_x_center,
+    trace_y_start,
+    substrate_height
 ]
 
 port1 = FDTD.AddLumpedPort(1, 50, port1_start, port1_stop, 'z', excite=1, priority=5)
 
 # Port 2 (output) - at end of trace
 port2_start = [
-    trace_x_center * unit,
-    trace_y_stop * unit,
+    trace_x_center,
+    trace_y_stop,
     0
 ]
 port2_stop = [
-    trace_x_center * unit,
-    trace_y_stop * unit,
-    substrate_height * unit
+    trace_x_center,
+    trace_y_stop,
+    substrate_height
 ]
 
 port2 = FDTD.AddLumpedPort(2, 50, port2_start, port2_stop, 'z', priority=5)
@@ -216,9 +230,14 @@ CSX.Write2XML(os.path.join(sim_path, 'microstrip.xml'))
 # from CSXCAD import AppCSXCAD_BIN
 # os.system(AppCSXCAD_BIN + ' ' + os.path.join(sim_path, 'microstrip.xml'))
 
-print("\nRunning simulation...")
-print("  (This may take a few minutes)")
-FDTD.Run(sim_path, cleanup=True, verbose=2)
+# Reuse the previous results when the complete setup is unchanged
+current, run_key = results_current(FDTD, sim_path)
+if current:
+    print("\n✓ Setup unchanged - reusing results in", sim_path)
+else:
+    print("\nRunning simulation...")
+    print("  (This may take a few minutes)")
+    run_fdtd(FDTD, sim_path, run_key)
 
 print("\nSimulation complete!")
 
@@ -233,21 +252,36 @@ freq = np.linspace(f_start, f_stop, f_points)
 port1.CalcPort(sim_path, freq)
 port2.CalcPort(sim_path, freq)
 
+# Preallocated result buffers: each quantity is computed in place, so the
+# post-processing makes one pass per array instead of one per temporary
+s11 = np.empty(f_points, dtype=np.complex128)
+s21 = np.empty(f_points, dtype=np.complex128)
+Zc_port1 = np.empty(f_points, dtype=np.complex128)
+Zc_port2 = np.empty(f_points, dtype=np.complex128)
+s11_dB = np.empty(f_points)
+s21_dB = np.empty(f_points)
+mag_Zc1 = np.empty(f_points)
+mag_Zc2 = np.empty(f_points)
+
 # Get S-parameters (for lumped ports, use u_ref/u_inc)
-s11 = port1.uf_ref / port1.uf_inc
-s21 = port2.uf_ref / port1.uf_inc
+np.divide(port1.uf_ref, port1.uf_inc, out=s11)
+np.divide(port2.uf_ref, port1.uf_inc, out=s21)
 
 # Convert to dB
-s11_dB = 20 * np.log10(np.abs(s11))
-s21_dB = 20 * np.log10(np.abs(s21))
+np.log10(np.abs(s11, out=s11_dB), out=s11_dB)
+s11_dB *= 20
+np.log10(np.abs(s21, out=s21_dB), out=s21_dB)
+s21_dB *= 20
 
 # Get port impedances
-Zc_port1 = port1.uf_tot / port1.if_tot
-Zc_port2 = port2.uf_tot / port2.if_tot
+np.divide(port1.uf_tot, port1.if_tot, out=Zc_port1)
+np.divide(port2.uf_tot, port2.if_tot, out=Zc_port2)
+np.abs(Zc_port1, out=mag_Zc1)
+np.abs(Zc_port2, out=mag_Zc2)
 
 print("\nResults:")
-print(f"  Port 1 impedance (avg): {np.mean(np.abs(Zc_port1)):.1f} Ω")
-print(f"  Port 2 impedance (avg): {np.mean(np.abs(Zc_port2)):.1f} Ω")
+print(f"  Port 1 impedance (avg): {mag_Zc1.mean():.1f} Ω")
+print(f"  Port 2 impedance (avg): {mag_Zc2.mean():.1f} Ω")
 print(f"  S11 @ 2.5 GHz: {s11_dB[f_points//2]:.2f} dB")
 print(f"  S21 @ 2.5 GHz: {s21_dB[f_points//2]:.2f} dB")
 print(f"\nNote: Using lumped ports (50Ω reference)")
@@ -258,6 +292,10 @@ print(f"\nNote: Using lumped ports (50Ω reference)")
 
 print("\nGenerating plots...")
 
+# Imported only now, with the non-interactive Agg backend: no GUI toolkit or
+# display connection is initialized, the figure goes straight to the PNG
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 
 fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
@@ -273,8 +311,8 @@ ax1.legend(fontsize=10)
 ax1.set_ylim([-40, 5])
 
 # Impedance
-ax2.plot(freq / 1e9, np.abs(Zc_port1), 'b-', linewidth=2, label='Port 1')
-ax2.plot(freq / 1e9, np.abs(Zc_port2), 'r-', linewidth=2, label='Port 2')
+ax2.plot(freq / 1e9, mag_Zc1, 'b-', linewidth=2, label='Port 1')
+ax2.plot(freq / 1e9, mag_Zc2, 'r-', linewidth=2, label='Port 2')
 ax2.axhline(y=50, color='k', linestyle='--', alpha=0.5, label='50 Ω')
 ax2.set_xlabel('Frequency (GHz)', fontsize=12)
 ax2.set_ylabel('Impedance (Ω)', fontsize=12)
@@ -288,8 +326,6 @@ plot_file = os.path.join(sim_path, 'results.png')
 plt.savefig(plot_file, dpi=150, bbox_inches='tight')
 print(f"\nPlot saved: {plot_file}")
 
-plt.show()
-
 print("\n" + "=" * 60)
 print("Simulation complete! Check the results:")
 print(f"  - Geometry: {sim_path}/microstrip.xml")
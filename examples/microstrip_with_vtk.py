@@ -14,6 +14,10 @@ import numpy as np
 from CSXCAD import ContinuousStructure
 from openEMS import openEMS
 
+from ems_common import buffer_stdout, results_current, run_fdtd
+
+buffer_stdout()
+
 # Simulation parameters
 unit = 1e-3  # units in mm
 f_max = 10e9  # 10 GHz
@@ -137,10 +141,15 @@ print("  Location:", sim_path)
 # Write geometry
 CSX.Write2XML(os.path.join(sim_path, 'geometry.xml'))
 
-# Run simulation
-print("\nRunning simulation...")
-print("  (This will create VTK files for ParaView)")
-FDTD.Run(sim_path, cleanup=True, verbose=2)
+# Reuse the previous results when the complete setup is unchanged
+current, run_key = results_current(FDTD, sim_path)
+if current:
+    print("\n✓ Setup unchanged - reusing results in", sim_path)
+else:
+    # Run simulation
+    print("\nRunning simulation...")
+    print("  (This will create VTK files for ParaView)")
+    run_fdtd(FDTD, sim_path, run_key)
 
 print("\n" + "=" * 60)
 print("Simulation Complete!")
@@ -12,6 +12,10 @@ import numpy as np
 from CSXCAD import ContinuousStructure
 from openEMS import openEMS
 
+from ems_common import buffer_stdout, results_current, run_fdtd
+
+buffer_stdout()
+
 # Units and frequency
 unit = 1e-3  # mm
 f0 = 2e9     # 2 GHz
@@ -21,6 +25,10 @@ size_x = 40
 size_y = 40
 size_z = 60
 
+# Field dump format: False = Et_*.vtr per timestep (ParaView),
+# True = a single Et.h5 holding every timestep (much less file I/O)
+dump_hdf5 = False
+
 # Simulation directory
 sim_path = os.path.abspath('simple_field_dump')
 os.makedirs(sim_path, exist_ok=True)
@@ -65,33 +73,42 @@ print(f"Excitation at z={size_z/3} mm")
 # IMPORTANT: Use mesh coordinates (same as mesh.AddLine), NOT SI units!
 dump_margin = 5  # mm margin from edges
 
-Et_dump = CSX.AddDump('Et', dump_type=0, file_type=0, dump_mode=2)
+Et_dump = CSX.AddDump('Et', dump_type=0, file_type=1 if dump_hdf5 else 0, dump_mode=2)
 Et_dump.AddBox(
     start=[dump_margin, dump_margin, dump_margin],
     stop=[size_x - dump_margin, size_y - dump_margin, size_z - dump_margin]
 )
 
-print(f"VTK dump region: {dump_margin} to {size_x-dump_margin} mm in each direction")
+print(f"Field dump region: {dump_margin} to {size_x-dump_margin} mm in each direction")
 print(f"This creates a {size_x-2*dump_margin} x {size_y-2*dump_margin} x {size_z-2*dump_margin} mm volume")
 
 # Write and run
 CSX.Write2XML(os.path.join(sim_path, 'geometry.xml'))
 
-print("\nRunning simulation...")
-print("Expected: ~2-3 minutes, ~500 VTK files")
-FDTD.Run(sim_path, cleanup=True, verbose=2)
+# Reuse the previous results when the complete setup is unchanged
+current, run_key = results_current(FDTD, sim_path)
+if current:
+    print("\n✓ Setup unchanged - reusing results in", sim_path)
+else:
+    print("\nRunning simulation...")
+    print("Expected: ~2-3 minutes, " + ("one Et.h5 file" if dump_hdf5 else "~500 VTK files"))
+    run_fdtd(FDTD, sim_path, run_key)
 
 print("\n" + "=" * 60)
 print("Complete!")
 print("=" * 60)
 
-# Count files
-vtk_files = [f for f in os.listdir(sim_path) if f.endswith('.vtr')]
-print(f"\n✓ Created {len(vtk_files)} VTK files in {sim_path}/")
-print("\nTo view:")
-print("  1. Open ParaView")
-print("  2. File → Open → Select all Et_*.vtr")
-print("  3. Click Apply")
-print("  4. Color by: E-field")
-print("  5. Play animation")
+if dump_hdf5:
+    print(f"\n✓ Field time series: {sim_path}/Et.h5")
+    print("  Read with h5py; set dump_hdf5 = False for ParaView .vtr files")
+else:
+    # Count files
+    vtk_files = [f for f in os.listdir(sim_path) if f.endswith('.vtr')]
+    print(f"\n✓ Created {len(vtk_files)} VTK files in {sim_path}/")
+    print("\nTo view:")
+    print("  1. Open ParaView")
+    print("  2. File → Open → Select all Et_*.vtr")
+    print("  3. Click Apply")
+    print("  4. Color by: E-field")
+    print("  5. Play animation")
 print("=" * 60)
@@ -0,0 +1,341 @@
+"""
+Shared gmsh, MPI and SIF helpers for the PDN scripts
+====================================================
+
+Every PDN script sets up gmsh with configure_gmsh(), picks its MPI ranks with
+mpi_settings() and builds its linear solver keywords with
+linear_system_block().
+
+pdn_simple.py and pdn_unified_simple.py solve the same problem: one board
+rectangle of uniform copper, VDD on the whole left edge and ground on the
+whole right edge. They only differ in mesh refinement and output names, so
+their whole mesh and SIF are built here.
+
+The gmsh session is left open between meshes (and finalized at exit), so
+run_pdn.py can drive both scripts in one process without restarting gmsh or
+re-importing numpy.
+The Elmer mesh is written straight from the gmsh model with elmer_mesh.py
+from ../../elmerfem-examples, so these serial runs need no ElmerGrid pass;
+the PDN scripts therefore only run from a full checkout of this repository.
+"""
+
+import os
+import sys
+import shutil
+import atexit
+import hashlib
+
+import numpy as np
+import gmsh
+
+# elmer_mesh.py lives in elmerfem-examples, so this module needs that tree
+# at ../../elmerfem-examples. It goes first on sys.path, so no other
+# elmer_mesh module that happens to be importable can shadow it
+ELMERFEM_EXAMPLES = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "elmerfem-examples"))
+sys.path.insert(0, ELMERFEM_EXAMPLES)
+from elmer_mesh import write_elmer_mesh
+
+VDD_BOUNDARY = 101
+GND_BOUNDARY = 102
+
+
+def configure_gmsh(size_from_field=True):
+    """Set the gmsh options shared by the PDN meshes
+
+    Call right after gmsh.initialize(), before any geometry is built, so the
+    OCC operations run on every core as well. With size_from_field the
+    background field alone decides the element size, otherwise the sizes set
+    on the points do. gmsh.clear() keeps global options, so a reused session
+    has to call this again for every mesh.
+    """
+    num_procs = os.cpu_count() or 1
+
+    # Frontal-Delaunay 2D algorithm with one gmsh thread per core
+    gmsh.option.setNumber("General.NumThreads", num_procs)
+    gmsh.option.setNumber("Geometry.OCCParallel", 1)
+    gmsh.option.setNumber("Mesh.Algorithm", 6)
+    gmsh.option.setNumber("Mesh.MaxNumThreads2D", num_procs)
+
+    # Errors and warnings only, and only physical groups go into the .msh
+    gmsh.option.setNumber("General.Verbosity", 2)
+    gmsh.option.setNumber("Mesh.SaveAll", 0)
+
+    from_points = 0 if size_from_field else 1
+    gmsh.option.setNumber("Mesh.MeshSizeExtendFromBoundary", from_points)
+    gmsh.option.setNumber("Mesh.MeshSizeFromPoints", from_points)
+    gmsh.option.setNumber("Mesh.MeshSizeFromCurvature", 0)
+
+
+def build_pdn_mesh(mesh_file, pcb_width, pcb_height, default_size=2.0, refinement_boxes=()):
+    """Mesh the board rectangle, write it to mesh_file as MSH 2.2 and as an
+    Elmer mesh database in the same directory
+
+    refinement_boxes is a tuple of (x_min, y_min, x_max, y_max, size, thickness)
+    boxes refined on top of default_size. Returns (num_vdd_edges,
+    num_gnd_edges, num_nodes, num_elements).
+
+    The Elmer mesh is reused when the directory still holds this mesh. The
+    other PDN scripts write their Elmer mesh to the same directory, so the
+    <mesh_file>.key stamp only counts if no mesh.header was written after it.
+    """
+    out_dir = os.path.dirname(mesh_file) or "."
+    mesh_key = hashlib.blake2b(repr((
+        pcb_width, pcb_height, default_size, refinement_boxes
+    )).encode(), digest_size=8).hexdigest()
+    grid_stamp = os.path.splitext(mesh_file)[0] + ".key"
+    mesh_header = os.path.join(out_dir, "mesh.header")
+
+    if (os.path.exists(grid_stamp) and os.path.exists(mesh_header)
+            and os.path.getmtime(grid_stamp) >= os.path.getmtime(mesh_header)):
+        with open(grid_stamp) as f:
+            stamp_key, *counts = f.read().split()
+        if stamp_key == mesh_key:
+            return tuple(int(c) for c in counts)
+
+    if not gmsh.isInitialized():
+        gmsh.initialize()
+        atexit.register(gmsh.finalize)
+    gmsh.clear()
+    gmsh.model.add(os.path.splitext(os.path.basename(mesh_file))[0])
+    configure_gmsh(size_from_field=bool(refinement_boxes))
+
+    # Single unified domain
+    domain = gmsh.model.occ.addRectangle(0, 0, 0, pcb_width, pcb_height)
+    gmsh.model.occ.synchronize()
+
+    gmsh.model.addPhysicalGroup(2, [domain], tag=1)
+    gmsh.model.setPhysicalName(2, 1, "PDN")
+
+    # Fetch every edge bounding box once, then classify all edges with masks
+    all_boundaries = gmsh.model.getBoundary([(2, domain)], oriented=False)
+    edge_tags = np.array([tag for _, tag in all_boundaries])
+    bbox = np.array([gmsh.model.getBoundingBox(dim, tag) for dim, tag in all_boundaries]).reshape(-1, 6)
+    x_min = bbox[:, 0]
+    x_max = bbox[:, 3]
+    y_center = (bbox[:, 1] + bbox[:, 4]) / 2
+    # The left and right edges are the ones centred in the middle third of the
+    # height; this keeps the top and bottom edges, which touch x = 0 and
+    # x = pcb_width only at the corners, out of the contacts
+    central = (pcb_height/3 < y_center) & (y_center < 2*pcb_height/3)
+
+    # VDD: whole left edge
+    vdd_mask = (x_min < 0.1) & central
+    # GND: whole right edge
+    gnd_mask = ~vdd_mask & (x_max > pcb_width - 0.1) & central
+
+    vdd_boundary = edge_tags[vdd_mask].tolist()
+    gnd_boundary = edge_tags[gnd_mask].tolist()
+
+    if vdd_boundary:
+        gmsh.model.addPhysicalGroup(1, vdd_boundary, tag=VDD_BOUNDARY)
+        gmsh.model.setPhysicalName(1, VDD_BOUNDARY, "VDD_Input")
+    if gnd_boundary:
+        gmsh.model.addPhysicalGroup(1, gnd_boundary, tag=GND_BOUNDARY)
+        gmsh.model.setPhysicalName(1, GND_BOUNDARY, "Ground_Reference")
+
+    if refinement_boxes:
+        # One background field that gmsh evaluates per node
+        size_fields = []
+        for bx_min, by_min, bx_max, by_max, size_in, thickness in refinement_boxes:
+            field = gmsh.model.mesh.field.add("Box")
+            gmsh.model.mesh.field.setNumber(field, "VIn", size_in)
+            gmsh.model.mesh.field.setNumber(field, "VOut", default_size)
+            gmsh.model.mesh.field.setNumber(field, "XMin", bx_min)
+            gmsh.model.mesh.field.setNumber(field, "XMax", bx_max)
+            gmsh.model.mesh.field.setNumber(field, "YMin", by_min)
+            gmsh.model.mesh.field.setNumber(field, "YMax", by_max)
+            gmsh.model.mesh.field.setNumber(field, "ZMin", -0.1)
+            gmsh.model.mesh.field.setNumber(field, "ZMax", 0.1)
+            gmsh.model.mesh.field.setNumber(field, "Thickness", thickness)
+            size_fields.append(field)
+
+        min_field = gmsh.model.mesh.field.add("Min")
+        gmsh.model.mesh.field.setNumbers(min_field, "FieldsList", size_fields)
+        gmsh.model.mesh.field.setAsBackgroundMesh(min_field)
+    else:
+        gmsh.model.mesh.setSize(gmsh.model.getEntities(0), default_size)
+
+    gmsh.model.mesh.generate(2)
+
+    # Counted inside gmsh, without copying the mesh out
+    num_nodes = int(gmsh.option.getNumber("Mesh.NbNodes"))
+    num_elements = int(gmsh.option.getNumber("Mesh.NbTriangles"))
+
+    # Elmer reads the mesh database written below, so the .msh is only kept
+    # for inspection in gmsh and can use the compact binary MSH 4.1 layout
+    gmsh.option.setNumber("Mesh.MshFileVersion", 4.1)
+    gmsh.option.setNumber("Mesh.Binary", 1)
+    gmsh.write(mesh_file)
+    write_elmer_mesh(out_dir)
+
+    counts = (len(vdd_boundary), len(gnd_boundary), num_nodes, num_elements)
+    with open(grid_stamp, 'w') as f:
+        f.write(" ".join(map(str, (mesh_key, *counts))))
+    return counts
+
+
+def mpi_settings(use_direct_solver=False, cap=4):
+    """Return (mpi_procs, use_mpi, partition_args) for ElmerGrid and mpirun
+
+    ElmerGrid partitions the mesh with METIS and ElmerSolver_mpi runs one rank
+    per part when an MPI build is available; otherwise the run is serial. The
+    PDN meshes have a few ten thousand elements at most, so the rank count is
+    capped at cap: more partitions would mostly add MPI start-up and halo
+    exchange. The UMFPack direct solver is serial-only in Elmer, so it also
+    keeps the run serial.
+    """
+    mpi_procs = min(os.cpu_count() or 1, cap)
+    use_mpi = bool(not use_direct_solver and mpi_procs > 1
+                   and shutil.which("mpirun") and shutil.which("ElmerSolver_mpi"))
+    partition_args = ["-partdual", "-metiskway", str(mpi_procs)] if use_mpi else []
+    return mpi_procs, use_mpi, partition_args
+
+
+# Preconditioner keywords for the iterative linear_system_block
+PRECONDITIONERS = {
+    "ILU0": """  Linear System Preconditioning = "ILU0"
+""",
+    "ILU1": """  Linear System Preconditioning = "ILU1"
+""",
+    # Algebraic multigrid with symmetric Gauss-Seidel smoothing; the
+    # iteration count stays nearly flat as the mesh is refined
+    "AMG": """  Linear System Preconditioning = "multigrid"
+  MG Method = Algebraic
+  MG Levels = 8
+  MG Smoother = SGS
+""",
+}
+
+
+def linear_system_block(use_direct_solver, preconditioner="ILU0",
+                        max_iterations=1000, tolerance=1.0e-8):
+    """Linear system keywords for the static-current solver
+
+    preconditioner is a key of PRECONDITIONERS and only applies to the
+    iterative solver.
+    """
+    if use_direct_solver:
+        return """  Linear System Solver = "Direct"
+  Linear System Direct Method = "UMFPack"
+"""
+    # The static-current operator is symmetric positive definite, so CG
+    # solves it without the fill-in of a direct factorization
+    return f"""  Linear System Solver = "Iterative"
+  Linear System Iterative Method = "CG"
+{PRECONDITIONERS[preconditioner]}  Linear System Max Iterations = {max_iterations}
+  Linear System Convergence Tolerance = {tolerance}
+  Linear System Abort Not Converged = True
+  Linear System Residual Output = 50
+  ! Symmetric diagonal scaling keeps the matrix SPD for CG
+  Linear System Scaling = Logical True
+  Optimize Bandwidth = True
+"""
+
+
+def write_stat_current_sif(sif_file, name, sigma, supply_voltage, ground_voltage,
+                           use_direct_solver=False,
+                           fields=("Electric Field", "Current Density")):
+    """Write the uniform-copper static-current SIF; results go to <name>.vtu"""
+    calculate = "\n".join(f"  Calculate {field} = True" for field in fields)
+
+    sif_content = f"""! Power Distribution Network (PDN) Analysis
+! Unified mesh with uniform copper conductivity
+
+Header
+  CHECK KEYWORDS Warn
+  Mesh DB "." "."
+  Include Path ""
+  Results Directory "."
+End
+
+Simulation
+  Max Output Level = 5
+  Coordinate System = "Cartesian 2D"
+  Coordinate Mapping(3) = 1 2 3
+
+  Simulation Type = "Steady State"
+  Steady State Max Iterations = 1
+  Output Intervals = 1
+
+  Solver Input File = "{os.path.basename(sif_file)}"
+  Post File = "{name}.vtu"
+  Output File = "{name}.dat"
+End
+
+Constants
+  Permittivity Of Vacuum = 8.8542e-12
+End
+
+! ============================================================================
+! BODY (Single unified domain)
+! ============================================================================
+
+Body 1
+  Name = "PDN"
+  Target Bodies(1) = 1
+  Equation = 1
+  Material = 1
+End
+
+! ============================================================================
+! MATERIAL (Uniform copper)
+! ============================================================================
+
+Material 1
+  Name = "Copper"
+  Electric Conductivity = Real {sigma}
+End
+
+! ============================================================================
+! EQUATION
+! ============================================================================
+
+Equation 1
+  Name = "StaticCurrent"
+  Active Solvers(1) = 1
+End
+
+! ============================================================================
+! SOLVER - Static Current Conduction
+! ============================================================================
+
+Solver 1
+  Equation = "Stat Current Solver"
+  Procedure = "StatCurrentSolve" "StatCurrentSolver"
+  Variable = "Potential"
+  Variable DOFs = 1
+
+{calculate}
+
+{linear_system_block(use_direct_solver)}
+  Steady State Convergence Tolerance = 1.0e-6
+
+  Nonlinear System Convergence Tolerance = 1.0e-8
+  Nonlinear System Max Iterations = 20
+  Nonlinear System Relaxation Factor = 1.0
+End
+
+! ============================================================================
+! BOUNDARY CONDITIONS
+! ============================================================================
+
+! VDD Input (3.3V power from regulator)
+Boundary Condition 1
+  Name = "VDD_Input"
+  Target Boundaries(1) = {VDD_BOUNDARY}
+  Potential = {supply_voltage}
+End
+
+! Ground Reference (0V return path)
+Boundary Condition 2
+  Name = "Ground_Reference"
+  Target Boundaries(1) = {GND_BOUNDARY}
+  Potential = {ground_voltage}
+End
+
+! All other boundaries are natural BC (insulating, zero normal current)
+"""
+
+    with open(sif_file, 'w') as f:
+        f.write(sif_content)
@@ -5,9 +5,14 @@ Simple, robust, and demonstrates the concept clearly.
 """
 import os
 import sys
+import collections
+import hashlib
 import numpy as np
 import gmsh
 import subprocess
+from pathlib import Path
+
+from pdn_common import configure_gmsh, mpi_settings, linear_system_block
 
 # Geometry (mm)
 pcb_width = 50.0
@@ -41,6 +46,20 @@ sigma_eff = copper_conductivity * copper_thickness / 1000.0
 supply_voltage = 3.3
 ground_voltage = 0.0
 
+# Optional supply sweep, e.g. [3.0, 3.3, 3.6]: all values are solved in one
+# Elmer run (Simulation Type = Scanning) on the same mesh and assembly
+# setup, one result file per value. Empty runs supply_voltage only.
+supply_voltage_sweep = []
+
+# The static-current operator is symmetric positive definite, so CG solves
+# it without the fill-in of a direct factorization. Set True to fall back to
+# the UMFPack direct solver.
+use_direct_solver = False
+
+# StatCurrentSolveVec is the vectorized rewrite of the static-current solver
+# (Elmer 8.4+). Older builds fall back to StatCurrentSolve automatically.
+use_vectorized_assembly = True
+
 print("="*70)
 print("PDN with Geometric Resistors")
 print("="*70)
@@ -56,126 +75,203 @@ R2_approx = (resistor_length/1000) / (sigma_eff * resistor2_width/1000)
 print(f"  R1 (0.2mm) ≈ {R1_approx:.3f} Ω")
 print(f"  R2 (0.1mm) ≈ {R2_approx:.3f} Ω (2× higher resistance)")
 
-gmsh.initialize()
-gmsh.model.add("pdn_geo")
-
-# Create power distribution network
-print("\nBuilding geometry...")
-
-# Regulator trace
-reg = gmsh.model.occ.addRectangle(0, pcb_height/2 - reg_trace_width/2, 0,
-                                   15, reg_trace_width)
-
-# Main bus  
-bus = gmsh.model.occ.addRectangle(15, pcb_height/2 - bus_width/2, 0,
-                                   30, bus_width)
-
-# Branches to loads (stop EXACTLY at load position, no overlap!)
-branch1 = gmsh.model.occ.addRectangle(load1_pos[0] - branch_width/2, load1_pos[1], 0,
-                                       branch_width, pcb_height/2 - load1_pos[1])
-
-branch2 = gmsh.model.occ.addRectangle(load2_pos[0] - branch_width/2, load2_pos[1], 0,
-                                       branch_width, pcb_height/2 - load2_pos[1])
-
-# Fuse power network
-power_net = gmsh.model.occ.fuse([(2, reg)],
-                                 [(2, bus), (2, branch1), (2, branch2)])[0]
-
-# Ground return - just main plane (no extra returns needed)
-ground = gmsh.model.occ.addRectangle(2, ground_y, 0, 45, ground_height)
-
-# Load resistors (NARROW vertical connectors with different widths)
-# Positioned EXACTLY between ground and branch, no overlap!
-resistor_bottom = ground_y + ground_height  # Exactly at top of ground
-resistor_top = load1_pos[1]  # Exactly at bottom of branch
-resistor_height = resistor_top - resistor_bottom
-
-load1_res = gmsh.model.occ.addRectangle(
-    load1_pos[0] - resistor1_width/2,
-    resistor_bottom,
-    0,
-    resistor1_width,
-    resistor_height
-)
-
-load2_res = gmsh.model.occ.addRectangle(
-    load2_pos[0] - resistor2_width/2,
-    resistor_bottom,
-    0,
-    resistor2_width,
-    resistor_height
-)
-
-# Debug: Check resistor sizes before fuse
-bbox1 = gmsh.model.occ.getBoundingBox(2, load1_res)
-bbox2 = gmsh.model.occ.getBoundingBox(2, load2_res)
-w1 = bbox1[3] - bbox1[0]
-w2 = bbox2[3] - bbox2[0]
-print(f"  Resistor 1 width before fuse: {w1:.4f} mm")
-print(f"  Resistor 2 width before fuse: {w2:.4f} mm")
-
-# Fuse everything into one connected conductor
-all_parts = gmsh.model.occ.fuse(
-    power_net,
-    [(2, ground), (2, load1_res), (2, load2_res)]
-)[0]
-
-gmsh.model.occ.synchronize()
-
-# One physical group for entire conductor
-gmsh.model.addPhysicalGroup(2, [all_parts[0][1]], tag=1)
-gmsh.model.setPhysicalName(2, 1, "Conductor")
-
-# Boundaries
-all_bounds = gmsh.model.getBoundary(all_parts, oriented=False)
-vdd_boundary = []
-gnd_boundary = []
-
-for dim, tag in all_bounds:
-    bbox = gmsh.model.getBoundingBox(dim, tag)
-    x_min, y_min, x_max, y_max = bbox[0], bbox[1], bbox[3], bbox[4]
-    y_center = (y_min + y_max) / 2
-    
-    # VDD: left edge at power net height
-    if x_min < 0.1 and abs(y_center - pcb_height/2) < reg_trace_width/3:
-        vdd_boundary.append(tag)
-    # GND: left edge at ground height
-    elif x_min < 3.0 and ground_y < y_center < ground_y + ground_height:
-        gnd_boundary.append(tag)
-
-if vdd_boundary:
-    gmsh.model.addPhysicalGroup(1, vdd_boundary, tag=101)
-    print(f"✓ VDD: {len(vdd_boundary)} edge(s)")
-
-if gnd_boundary:
-    gmsh.model.addPhysicalGroup(1, gnd_boundary, tag=102)
-    print(f"✓ GND: {len(gnd_boundary)} edge(s)")
-
-gmsh.model.occ.synchronize()
-
-# Mesh - FINE in narrow resistors!
-print("\nGenerating mesh...")
-gmsh.model.mesh.setSize(gmsh.model.getEntities(0), 1.0)  # Default
-
-# Very fine mesh in narrow resistor regions
-for load_pos in [load1_pos, load2_pos]:
-    nearby = gmsh.model.getEntitiesInBoundingBox(
-        load_pos[0] - 0.5, ground_y, -0.1, load_pos[0] + 0.5, 30, 0.1, dim=0)
-    if nearby:
-        gmsh.model.mesh.setSize(nearby, 0.05)  # 50 µm mesh!
-
-gmsh.model.mesh.generate(2)
-num_nodes = len(gmsh.model.mesh.getNodes()[0])
-print(f"  Nodes: {num_nodes}")
+num_procs = os.cpu_count() or 1
 
 output_dir = "simulation"
 os.makedirs(output_dir, exist_ok=True)
-mesh_file = os.path.join(output_dir, "pdn_geo.msh")
-gmsh.write(mesh_file)
-gmsh.finalize()
 
-subprocess.run(["ElmerGrid", "14", "2", mesh_file, "-out", output_dir],
-               check=True, capture_output=True)
+# Mesh sizes (mm): the element size grows from resistor_mesh_size at the
+# resistor edges to default_mesh_size between refine_dist_min and
+# refine_dist_max from them. The resistor edges are the curves within
+# +-resistor_search_half_width of each load x, from ground_y up to
+# resistor_search_y_max. Used by the size fields and the cache key.
+resistor_mesh_size = 0.05
+default_mesh_size = 1.0
+refine_dist_min = 0.1
+refine_dist_max = 2.0
+resistor_search_half_width = 0.5
+resistor_search_y_max = 30.0
+
+# Mesh cache: the mesh only depends on the geometry and the mesh sizes, not
+# on the conductivity or the supply voltage, so its file name carries a hash
+# of those. Voltage or material sweeps reuse the mesh and the Elmer mesh.
+mesh_key = hashlib.blake2b(repr((
+    pcb_width, pcb_height, reg_trace_width, bus_width, branch_width,
+    load1_pos, load2_pos, ground_y, ground_height, resistor1_width, resistor2_width,
+    resistor_mesh_size, default_mesh_size, refine_dist_min, refine_dist_max,
+    resistor_search_half_width, resistor_search_y_max,
+)).encode(), digest_size=8).hexdigest()
+mesh_file = os.path.join(output_dir, f"pdn_geo_{mesh_key}.msh")
+
+if os.path.exists(mesh_file):
+    print(f"\n✓ Reusing cached mesh: {mesh_file}")
+else:
+    gmsh.initialize()
+    gmsh.model.add("pdn_geo")
+
+    configure_gmsh()
+
+    # Create power distribution network
+    print("\nBuilding geometry...")
+
+    # Regulator trace
+    reg = gmsh.model.occ.addRectangle(0, pcb_height/2 - reg_trace_width/2, 0,
+                                       15, reg_trace_width)
+
+    # Main bus  
+    bus = gmsh.model.occ.addRectangle(15, pcb_height/2 - bus_width/2, 0,
+                                       30, bus_width)
+
+    # Branches to loads (stop EXACTLY at load position, no overlap!)
+    branch1 = gmsh.model.occ.addRectangle(load1_pos[0] - branch_width/2, load1_pos[1], 0,
+                                           branch_width, pcb_height/2 - load1_pos[1])
+
+    branch2 = gmsh.model.occ.addRectangle(load2_pos[0] - branch_width/2, load2_pos[1], 0,
+                                           branch_width, pcb_height/2 - load2_pos[1])
+
+    # Ground return - just main plane (no extra returns needed)
+    ground = gmsh.model.occ.addRectangle(2, ground_y, 0, 45, ground_height)
+
+    # Load resistors (NARROW vertical connectors with different widths)
+    # Positioned EXACTLY between ground and branch, no overlap!
+    resistor_bottom = ground_y + ground_height  # Exactly at top of ground
+    resistor_top = load1_pos[1]  # Exactly at bottom of branch
+    resistor_height = resistor_top - resistor_bottom
+
+    load1_res = gmsh.model.occ.addRectangle(
+        load1_pos[0] - resistor1_width/2,
+        resistor_bottom,
+        0,
+        resistor1_width,
+        resistor_height
+    )
+
+    load2_res = gmsh.model.occ.addRectangle(
+        load2_pos[0] - resistor2_width/2,
+        resistor_bottom,
+        0,
+        resistor2_width,
+        resistor_height
+    )
+
+    # Debug: Check resistor sizes before fuse
+    bbox1 = gmsh.model.occ.getBoundingBox(2, load1_res)
+    bbox2 = gmsh.model.occ.getBoundingBox(2, load2_res)
+    w1 = bbox1[3] - bbox1[0]
+    w2 = bbox2[3] - bbox2[0]
+    print(f"  Resistor 1 width before fuse: {w1:.4f} mm")
+    print(f"  Resistor 2 width before fuse: {w2:.4f} mm")
+
+    # Fuse power network, ground and resistors into one connected conductor
+    # in a single boolean operation
+    all_parts = gmsh.model.occ.fuse(
+        [(2, reg)],
+        [(2, bus), (2, branch1), (2, branch2), (2, ground), (2, load1_res), (2, load2_res)]
+    )[0]
+
+    gmsh.model.occ.synchronize()
+
+    # One physical group for entire conductor
+    gmsh.model.addPhysicalGroup(2, [all_parts[0][1]], tag=1)
+    gmsh.model.setPhysicalName(2, 1, "Conductor")
+
+    # Boundaries
+    # Fetch every edge bounding box once, then classify all edges with masks
+    all_bounds = gmsh.model.getBoundary(all_parts, oriented=False)
+    edge_tags = np.array([tag for _, tag in all_bounds])
+    bbox = np.array([gmsh.model.getBoundingBox(dim, tag) for dim, tag in all_bounds]).reshape(-1, 6)
+    x_min = bbox[:, 0]
+    y_center = (bbox[:, 1] + bbox[:, 4]) / 2
+
+    # VDD: left edge at power net height
+    vdd_mask = (x_min < 0.1) & (np.abs(y_center - pcb_height/2) < reg_trace_width/3)
+    # GND: left edge at ground height
+    gnd_mask = ~vdd_mask & (x_min < 3.0) & (ground_y < y_center) & (y_center < ground_y + ground_height)
+
+    vdd_boundary = edge_tags[vdd_mask].tolist()
+    gnd_boundary = edge_tags[gnd_mask].tolist()
+
+    if vdd_boundary:
+        gmsh.model.addPhysicalGroup(1, vdd_boundary, tag=101)
+        print(f"✓ VDD: {len(vdd_boundary)} edge(s)")
+
+    if gnd_boundary:
+        gmsh.model.addPhysicalGroup(1, gnd_boundary, tag=102)
+        print(f"✓ GND: {len(gnd_boundary)} edge(s)")
+
+    # Mesh - FINE in narrow resistors!
+    print("\nGenerating mesh...")
+
+    # Very fine mesh in narrow resistor regions: a Distance field measures the
+    # distance to the resistor edges and a Threshold field turns it into the
+    # element size, 50 µm at the edges growing to the 1 mm default
+    resistor_curves = [
+        tag for load_pos in [load1_pos, load2_pos]
+        for _, tag in gmsh.model.getEntitiesInBoundingBox(
+            load_pos[0] - resistor_search_half_width, ground_y, -0.1,
+            load_pos[0] + resistor_search_half_width, resistor_search_y_max, 0.1, dim=1)
+    ]
+    distance_field = gmsh.model.mesh.field.add("Distance")
+    gmsh.model.mesh.field.setNumbers(distance_field, "CurvesList", resistor_curves)
+    gmsh.model.mesh.field.setNumber(distance_field, "Sampling", 200)
+
+    threshold_field = gmsh.model.mesh.field.add("Threshold")
+    gmsh.model.mesh.field.setNumber(threshold_field, "InField", distance_field)
+    gmsh.model.mesh.field.setNumber(threshold_field, "SizeMin", resistor_mesh_size)  # 50 µm mesh!
+    gmsh.model.mesh.field.setNumber(threshold_field, "SizeMax", default_mesh_size)
+    gmsh.model.mesh.field.setNumber(threshold_field, "DistMin", refine_dist_min)
+    gmsh.model.mesh.field.setNumber(threshold_field, "DistMax", refine_dist_max)
+    gmsh.model.mesh.field.setAsBackgroundMesh(threshold_field)
+
+    gmsh.model.mesh.generate(2)
+    num_nodes = int(gmsh.option.getNumber("Mesh.NbNodes"))
+    print(f"  Nodes: {num_nodes}")
+
+    # MSH 2.2 is the format ElmerGrid reads; binary is opt-in (ELMER_BINARY_MSH=1)
+    gmsh.option.setNumber("Mesh.MshFileVersion", 2.2)
+    gmsh.option.setNumber("Mesh.Binary", 1 if os.environ.get("ELMER_BINARY_MSH") == "1" else 0)
+    gmsh.write(mesh_file)
+    gmsh.finalize()
+
+# Use MPI when available, otherwise run serially
+mpi_procs, use_mpi, partition_args = mpi_settings(use_direct_solver)
+
+# Convert to Elmer, unless output_dir already holds this mesh with the same
+# partitioning. The other PDN scripts write their Elmer mesh to the same
+# directory, so the stamp only counts if no mesh.header was written after it
+grid_key = " ".join([mesh_key, *partition_args])
+grid_stamp = os.path.join(output_dir, "pdn_geo_mesh.key")
+mesh_header = os.path.join(output_dir, "mesh.header")
+if (os.path.exists(grid_stamp) and os.path.exists(mesh_header)
+        and os.path.getmtime(grid_stamp) >= os.path.getmtime(mesh_header)
+        and Path(grid_stamp).read_text() == grid_key):
+    print("✓ Reusing Elmer mesh")
+    grid_proc = None
+else:
+    # The SIF does not depend on the Elmer mesh, so ElmerGrid runs in the
+    # background while it is written
+    grid_proc = subprocess.Popen(["ElmerGrid", "14", "2", mesh_file, "-out", output_dir, *partition_args],
+                                 stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+# Linear system block for Solver 1
+linear_system = linear_system_block(use_direct_solver, "ILU1")
+
+stat_current_module = "StatCurrentSolveVec" if use_vectorized_assembly else "StatCurrentSolve"
+
+# Steady state for a single supply voltage; a sweep scans one step per value
+# with the VDD potential tabulated against the step number
+if supply_voltage_sweep:
+    simulation_type = f"""Simulation Type = "Scanning"
+  Timestep Intervals = {len(supply_voltage_sweep)}
+  Output Intervals = 1"""
+    vdd_table = "\n".join(f"    {step} {v}" for step, v in enumerate(supply_voltage_sweep, start=1))
+    vdd_potential = f"""Potential = Variable Time
+    Real
+{vdd_table}
+    End"""
+else:
+    simulation_type = 'Simulation Type = "Steady State"'
+    vdd_potential = f"Potential = {supply_voltage}"
 
 # SIF with uniform material
 sif = f"""
@@ -185,7 +281,7 @@ End
 
 Simulation
   Coordinate System = "Cartesian 2D"
-  Simulation Type = "Steady State"
+  {simulation_type}
   Steady State Max Iterations = 1
   Post File = "pdn_geo.vtu"
 End
@@ -207,14 +303,16 @@ End
 
 Solver 1
   Equation = "StatCurrentSolver"
-  Procedure = "StatCurrentSolve" "StatCurrentSolver"
+  Procedure = "{stat_current_module}" "StatCurrentSolver"
   Variable = "Potential"
 
   Calculate Joule Heating = True
 
-  Linear System Solver = "Direct"
-  Linear System Direct Method = "UMFPack"
-End
+  ! Colour-partitioned, thread-parallel assembly
+  MultiColour Solver = Logical True
+  MultiColour Consistent = Logical True
+
+{linear_system}End
 
 Solver 2
   Exec Solver = After Timestep
@@ -230,19 +328,26 @@ Solver 2
   Calculate Grad = Logical True
   Calculate Grad Abs = Logical True
 
+  MultiColour Solver = Logical True
+  MultiColour Consistent = Logical True
+
   Target Variable = String "Current Density"
 
+  ! The projection system is a mass matrix: SPD and well conditioned
+  ! independent of mesh size, so diagonally preconditioned CG converges
+  ! in a few iterations
   Linear System Solver = "Iterative"
-  Linear System Iterative Method = "BiCGStab"
+  Linear System Iterative Method = "CG"
   Linear System Max Iterations = 500
   Linear System Convergence Tolerance = 1.0e-6
-  Linear System Preconditioning = ILU0
-  Linear System Residual Output = 10
+  Linear System Preconditioning = Diagonal
+  Linear System Residual Output = 50
+  Linear System Scaling = Logical True
 End
 
 Boundary Condition 1
   Target Boundaries(1) = 101
-  Potential = {supply_voltage}
+  {vdd_potential}
 End
 
 Boundary Condition 2
@@ -255,16 +360,65 @@ sif_file = os.path.join(output_dir, "pdn_geo.sif")
 with open(sif_file, 'w') as f:
     f.write(sif)
 
+# Wait for the background mesh conversion
+if grid_proc is not None:
+    grid_output, _ = grid_proc.communicate()
+    if grid_proc.returncode != 0:
+        print("✗ ElmerGrid failed:")
+        print(grid_output)
+        sys.exit(1)
+    with open(grid_stamp, 'w') as f:
+        f.write(grid_key)
+
+# OpenMP threads for the multicolour assembly: all cores for a serial run,
+# one per rank under MPI so the ranks do not oversubscribe the cores
+solver_env = dict(os.environ,
+                  OMP_NUM_THREADS="1" if use_mpi else str(num_procs),
+                  OMP_PROC_BIND="close",
+                  OMP_PLACES="cores")
+
+# Solver output streams to a log file rather than a pipe, so a long residual
+# history neither piles up in memory nor stalls the solver
 print("\nRunning ElmerSolver...")
-result = subprocess.run(["ElmerSolver", "pdn_geo.sif"],
-                       cwd=output_dir, capture_output=True, text=True)
+solver_cmd = (["mpirun", "-np", str(mpi_procs), "ElmerSolver_mpi"] if use_mpi
+              else ["ElmerSolver"])
+print(f"  Processes: {mpi_procs if use_mpi else 1}")
+solver_log = os.path.join(output_dir, "pdn_geo_solver.log")
+
+
+def run_solver(sif_name):
+    with open(solver_log, 'w') as log_file:
+        return subprocess.run([*solver_cmd, sif_name],
+                              cwd=output_dir, env=solver_env,
+                              stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def vec_module_missing():
+    """True if the log shows Elmer could not load StatCurrentSolveVec"""
+    with open(solver_log, errors='replace') as log_file:
+        return any("StatCurrentSolveVec" in line and "Unable to" in line
+                   for line in log_file)
+
+
+result = run_solver("pdn_geo.sif")
+# Only an Elmer build without the vectorized module is retried; any other
+# failure (divergence, MPI launch, missing mesh) is reported as is
+if result.returncode != 0 and use_vectorized_assembly and vec_module_missing():
+    print("⚠ StatCurrentSolveVec not available, retrying with StatCurrentSolve")
+    with open(os.path.join(output_dir, "pdn_geo_scalar.sif"), 'w') as f:
+        f.write(sif.replace('"StatCurrentSolveVec"', '"StatCurrentSolve"'))
+    result = run_solver("pdn_geo_scalar.sif")
 
 if result.returncode == 0:
     print("✓ Simulation completed!")
     import glob
-    vtu = glob.glob(os.path.join(output_dir, "pdn_geo*.vtu"))
+    # MPI runs write one .vtu per partition plus a .pvtu that collects them
+    vtu = sorted(glob.glob(os.path.join(output_dir, "pdn_geo*.pvtu"))
+                 or glob.glob(os.path.join(output_dir, "pdn_geo*.vtu")))
     if vtu:
         print(f"\n✓ Results: {vtu[0]}")
+        if supply_voltage_sweep:
+            print(f"  One result per supply voltage: {', '.join(map(str, supply_voltage_sweep))} V")
         print("\nVisualize: paraview", vtu[0])
         print("\nYou should see:")
         print("  - PDN structure (power traces + ground)")
@@ -272,6 +426,9 @@ if result.returncode == 0:
         print("  - Voltage drops in resistors")
         print("  - Current crowding in narrow regions")
 else:
-    print("✗ Failed:", result.stdout[-300:])
+    with open(solver_log) as log_file:
+        tail = collections.deque(log_file, maxlen=10)
+    print("✗ Failed:", "".join(tail))
+    print(f"  Check log file: {solver_log}")
 
 print("="*70)
@@ -4,11 +4,10 @@ Simplified PDN with coordinate-based material assignment (no fragment operation)
 """
 import os
 import sys
-import numpy as np
-import gmsh
-import meshio
 import subprocess
 
+from pdn_common import build_pdn_mesh, write_stat_current_sif
+
 # Geometry parameters
 pcb_width = 50.0
 pcb_height = 40.0
@@ -36,126 +35,28 @@ sigma_eff_copper = copper_conductivity * copper_thickness / 1000.0
 supply_voltage = 3.3
 ground_voltage = 0.0
 
+# The static-current operator is symmetric positive definite, so CG solves
+# it without the fill-in of a direct factorization. Set True to fall back to
+# the UMFPack direct solver.
+use_direct_solver = False
+
 print("="*70)
 print("Simplified PDN - Single Unified Mesh")
 print("="*70)
 
-# Create unified geometry - single rectangle covering everything
-gmsh.initialize()
-gmsh.model.add("pdn_simple")
-
-# Create one big rectangle that includes everything
-domain = gmsh.model.occ.addRectangle(0, 0, 0, pcb_width, pcb_height)
-
-gmsh.model.occ.synchronize()
-
-# Single physical group for the entire domain
-gmsh.model.addPhysicalGroup(2, [domain], tag=1)
-gmsh.model.setPhysicalName(2, 1, "PDN")
-
-# Create boundaries for BCs
-all_boundaries = gmsh.model.getBoundary([(2, domain)], oriented=False)
-
-vdd_boundary = []
-gnd_boundary = []
-
-for dim, tag in all_boundaries:
-    bbox = gmsh.model.getBoundingBox(dim, tag)
-    x_min, y_min, z_min, x_max, y_max, z_max = bbox
-    y_center = (y_min + y_max) / 2
-
-    # VDD: left edge, central portion only (avoid corners!)
-    # Only apply BC where y is in middle third of domain
-    if x_min < 0.1 and (pcb_height/3 < y_center < 2*pcb_height/3):
-        vdd_boundary.append(tag)
-    # GND: right edge, central portion only (avoid corners!)
-    elif x_max > pcb_width - 0.1 and (pcb_height/3 < y_center < 2*pcb_height/3):
-        gnd_boundary.append(tag)
-
-if vdd_boundary:
-    gmsh.model.addPhysicalGroup(1, vdd_boundary, tag=101)
-    gmsh.model.setPhysicalName(1, 101, "VDD")
-
-if gnd_boundary:
-    gmsh.model.addPhysicalGroup(1, gnd_boundary, tag=102)
-    gmsh.model.setPhysicalName(1, 102, "GND")
-
-gmsh.model.occ.synchronize()
-
-# Mesh
-gmsh.model.mesh.setSize(gmsh.model.getEntities(0), 2.0)
-gmsh.model.mesh.generate(2)
-
-# Export
+# Unified geometry - single rectangle covering everything, uniform 2 mm mesh
 output_dir = "simulation"
 os.makedirs(output_dir, exist_ok=True)
 mesh_file = os.path.join(output_dir, "pdn_simple.msh")
-gmsh.write(mesh_file)
-print(f"\nMesh written to: {mesh_file}")
-gmsh.finalize()
-
-# Convert to Elmer
-subprocess.run(["ElmerGrid", "14", "2", mesh_file, "-out", output_dir], check=True)
-
-# Create SIF with coordinate-based conductivity
-# In each point (x,y), assign conductivity based on what region it's in
-
-sif = f"""
-Header
-  Mesh DB "." "."
-End
-
-Simulation
-  Coordinate System = "Cartesian 2D"
-  Simulation Type = "Steady State"
-  Steady State Max Iterations = 1
-  Post File = "pdn_simple.vtu"
-End
-
-Body 1
-  Target Bodies(1) = 1
-  Equation = 1
-  Material = 1
-End
-
-! Simple constant conductivity for connectivity test
-Material 1
-  Name = "Copper"
-  Electric Conductivity = Real {sigma_eff_copper}
-End
-
-Equation 1
-  Active Solvers(1) = 1
-End
-
-Solver 1
-  Equation = "StatCurrentSolver"
-  Procedure = "StatCurrentSolve" "StatCurrentSolver"
-  Variable = "Potential"
-  
-  Calculate Electric Field = True
-  Calculate Current Density = True
-  
-  Linear System Solver = "Direct"
-  Linear System Direct Method = "UMFPack"
-  
-  Steady State Convergence Tolerance = 1e-6
-End
-
-Boundary Condition 1
-  Target Boundaries(1) = 101
-  Potential = {supply_voltage}
-End
-
-Boundary Condition 2
-  Target Boundaries(1) = 102
-  Potential = {ground_voltage}
-End
-"""
+num_vdd, num_gnd, num_nodes, num_elements = build_pdn_mesh(mesh_file, pcb_width, pcb_height, default_size=2.0)
+print(f"\n✓ VDD: {num_vdd} edge(s), GND: {num_gnd} edge(s)")
+print(f"  Nodes: {num_nodes}, Elements: {num_elements}")
+print(f"Mesh written to: {mesh_file}")
 
+# Uniform conductivity; position-dependent conductivity is pdn_option2.py
 sif_file = os.path.join(output_dir, "pdn_simple.sif")
-with open(sif_file, 'w') as f:
-    f.write(sif)
+write_stat_current_sif(sif_file, "pdn_simple", sigma_eff_copper, supply_voltage, ground_voltage,
+                       use_direct_solver=use_direct_solver)
 
 print(f"SIF file: {sif_file}")
 print("\n⚠  Note: This simplified version uses uniform conductivity")
@@ -164,19 +65,23 @@ print("   For now, this tests basic connectivity")
 
 # Run solver
 print("\nRunning ElmerSolver...")
-result = subprocess.run(
-    ["ElmerSolver", "pdn_simple.sif"],
-    cwd=output_dir,
-    capture_output=True,
-    text=True
-)
+solver_log = os.path.join(output_dir, "pdn_simple_solver.log")
+with open(solver_log, 'wb') as log_file:
+    result = subprocess.run(
+        ["ElmerSolver", "pdn_simple.sif"],
+        cwd=output_dir,
+        stdout=log_file,
+        stderr=subprocess.STDOUT
+    )
 
 if result.returncode == 0:
     print("✓ Solver completed")
     print(f"✓ Results: {output_dir}/pdn_simple.vtu")
 else:
     print(f"✗ Solver failed")
-    print(result.stdout)
-    print(result.stderr)
+    with open(solver_log, 'rb') as f:
+        f.seek(max(0, os.path.getsize(solver_log) - 1000))
+        print(f.read().decode(errors='replace'))
+    print(f"  Full log: {solver_log}")
 
 print("="*70)
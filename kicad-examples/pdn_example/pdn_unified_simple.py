@@ -5,11 +5,11 @@ Shows voltage drop in power distribution network without explicit load resistors
 """
 import os
 import sys
-import numpy as np
-import gmsh
-import meshio
+import shutil
 import subprocess
 
+from pdn_common import build_pdn_mesh, write_stat_current_sif
+
 # ==============================================================================
 # GEOMETRY PARAMETERS (mm)
 # ==============================================================================
@@ -45,6 +45,16 @@ sigma_eff_copper = copper_conductivity * copper_thickness / 1000.0
 supply_voltage = 3.3
 ground_voltage = 0.0
 
+# The static-current operator is symmetric positive definite, so CG solves
+# it without the fill-in of a direct factorization. Set True to fall back to
+# the UMFPack direct solver.
+use_direct_solver = False
+
+# MPI ranks for ElmerSolver_mpi. Fine meshes solve faster split into METIS
+# partitions, one rank per part; the run falls back to serial when mpirun or
+# ElmerSolver_mpi is missing.
+mpi_procs = 1
+
 print("="*70)
 print("PDN Analysis - Unified Mesh (Uniform Copper)")
 print("="*70)
@@ -62,235 +72,75 @@ print()
 # CREATE UNIFIED MESH
 # ==============================================================================
 
-gmsh.initialize()
-gmsh.model.add("pdn_unified")
-
-# Create single unified domain
-domain = gmsh.model.occ.addRectangle(0, 0, 0, pcb_width, pcb_height)
-gmsh.model.occ.synchronize()
-
-# Physical group for entire domain
-gmsh.model.addPhysicalGroup(2, [domain], tag=1)
-gmsh.model.setPhysicalName(2, 1, "PDN")
-
-# ==============================================================================
-# BOUNDARY CONDITIONS
-# ==============================================================================
-
-all_boundaries = gmsh.model.getBoundary([(2, domain)], oriented=False)
-
-vdd_boundary = []
-gnd_boundary = []
-
-for dim, tag in all_boundaries:
-    bbox = gmsh.model.getBoundingBox(dim, tag)
-    x_min, y_min, z_min, x_max, y_max, z_max = bbox
-    y_center = (y_min + y_max) / 2
-    
-    # VDD: left edge, central portion (avoid corners)
-    if x_min < 0.1 and (pcb_height/3 < y_center < 2*pcb_height/3):
-        vdd_boundary.append(tag)
-
-    # GND: right edge, central portion (avoid corners)
-    elif x_max > pcb_width - 0.1 and (pcb_height/3 < y_center < 2*pcb_height/3):
-        gnd_boundary.append(tag)
+output_dir = "simulation"
+os.makedirs(output_dir, exist_ok=True)
+mesh_file = os.path.join(output_dir, "pdn_unified.msh")
 
-if vdd_boundary:
-    gmsh.model.addPhysicalGroup(1, vdd_boundary, tag=101)
-    gmsh.model.setPhysicalName(1, 101, "VDD_Input")
-    print(f"✓ VDD input: {len(vdd_boundary)} edge(s)")
+print("Generating mesh...")
 
-if gnd_boundary:
-    gmsh.model.addPhysicalGroup(1, gnd_boundary, tag=102)
-    gmsh.model.setPhysicalName(1, 102, "Ground_Reference")
-    print(f"✓ Ground reference: {len(gnd_boundary)} edge(s)")
+# Mesh sizes: 2.0 mm by default, 0.5 mm in bands along the power and ground
+# traces and 0.3 mm around the load positions
+refinement_boxes = tuple(
+    (-0.1, y - 5, pcb_width + 0.1, y + 5, 0.5, 1.0)  # smooth transition
+    for y in [pcb_height/2, ground_y_offset + ground_trace_width/2]
+) + tuple(
+    (lx - 2, ly - 2, lx + 2, ly + 2, 0.3, 0.0)  # for future load modeling
+    for lx, ly in [load1_pos, load2_pos, load3_pos]
+)
+num_vdd, num_gnd, num_nodes, num_elements = build_pdn_mesh(
+    mesh_file, pcb_width, pcb_height, default_size=2.0, refinement_boxes=refinement_boxes
+)
 
-if not vdd_boundary or not gnd_boundary:
+if num_vdd:
+    print(f"✓ VDD input: {num_vdd} edge(s)")
+if num_gnd:
+    print(f"✓ Ground reference: {num_gnd} edge(s)")
+if not num_vdd or not num_gnd:
     print("⚠ WARNING: Missing boundary conditions!")
     sys.exit(1)
 
-gmsh.model.occ.synchronize()
-
-# ==============================================================================
-# MESHING
-# ==============================================================================
-
-print("\nGenerating mesh...")
-
-# Default mesh size
-gmsh.model.mesh.setSize(gmsh.model.getEntities(0), 2.0)
-
-# Refine mesh in power distribution region (where traces are)
-for y in [pcb_height/2, ground_y_offset + ground_trace_width/2]:
-    for x in range(0, int(pcb_width), 5):
-        nearby = gmsh.model.getEntitiesInBoundingBox(
-            x-1, y-5, -0.1, x+1, y+5, 0.1, dim=0
-        )
-        if nearby:
-            gmsh.model.mesh.setSize(nearby, 0.5)
-
-# Very fine mesh near load positions (for future load modeling)
-for lx, ly in [load1_pos, load2_pos, load3_pos]:
-    nearby = gmsh.model.getEntitiesInBoundingBox(
-        lx-2, ly-2, -0.1, lx+2, ly+2, 0.1, dim=0
-    )
-    if nearby:
-        gmsh.model.mesh.setSize(nearby, 0.3)
-
-gmsh.model.mesh.generate(2)
-
-num_nodes = len(gmsh.model.mesh.getNodes()[0])
-num_elements = len(gmsh.model.mesh.getElements()[2][1])
 print(f"  Nodes: {num_nodes}")
 print(f"  Elements: {num_elements}")
-
-# ==============================================================================
-# EXPORT
-# ==============================================================================
-
-output_dir = "simulation"
-os.makedirs(output_dir, exist_ok=True)
-
-mesh_file = os.path.join(output_dir, "pdn_unified.msh")
-gmsh.write(mesh_file)
 print(f"\nMesh written to: {mesh_file}")
 
-gmsh.finalize()
-
-# Convert to Elmer format
-print("Converting to Elmer format...")
-subprocess.run(
-    ["ElmerGrid", "14", "2", mesh_file, "-out", output_dir],
-    check=True,
-    capture_output=True
-)
-
 # ==============================================================================
 # ELMERFEM SOLVER INPUT FILE (SIF)
 # ==============================================================================
 
 print("Creating ElmerFEM solver input file...")
 
-sif_content = f"""! Power Distribution Network (PDN) Analysis
-! Unified mesh with uniform copper conductivity
-
-Header
-  CHECK KEYWORDS Warn
-  Mesh DB "." "."
-  Include Path ""
-  Results Directory "."
-End
-
-Simulation
-  Max Output Level = 5
-  Coordinate System = "Cartesian 2D"
-  Coordinate Mapping(3) = 1 2 3
-
-  Simulation Type = "Steady State"
-  Steady State Max Iterations = 1
-  Output Intervals = 1
-
-  Solver Input File = "pdn_unified.sif"
-  Post File = "pdn_unified.vtu"
-  Output File = "pdn_unified.dat"
-End
-
-Constants
-  Permittivity Of Vacuum = 8.8542e-12
-End
-
-! ============================================================================
-! BODY (Single unified domain)
-! ============================================================================
-
-Body 1
-  Name = "PDN"
-  Target Bodies(1) = 1
-  Equation = 1
-  Material = 1
-End
-
-! ============================================================================
-! MATERIAL (Uniform copper)
-! ============================================================================
-
-Material 1
-  Name = "Copper"
-  Electric Conductivity = Real {sigma_eff_copper}
-End
-
-! ============================================================================
-! EQUATION
-! ============================================================================
-
-Equation 1
-  Name = "StaticCurrent"
-  Active Solvers(1) = 1
-End
-
-! ============================================================================
-! SOLVER - Static Current Conduction
-! ============================================================================
-
-Solver 1
-  Equation = "Stat Current Solver"
-  Procedure = "StatCurrentSolve" "StatCurrentSolver"
-  Variable = "Potential"
-  Variable DOFs = 1
-
-  Calculate Electric Field = True
-  Calculate Current Density = True
-  Calculate Joule Heating = True
-
-  ! Direct solver for guaranteed convergence
-  Linear System Solver = "Direct"
-  Linear System Direct Method = "UMFPack"
-
-  Steady State Convergence Tolerance = 1.0e-6
-
-  Nonlinear System Convergence Tolerance = 1.0e-8
-  Nonlinear System Max Iterations = 20
-  Nonlinear System Relaxation Factor = 1.0
-End
-
-! ============================================================================
-! BOUNDARY CONDITIONS
-! ============================================================================
-
-! VDD Input (3.3V power from regulator)
-Boundary Condition 1
-  Name = "VDD_Input"
-  Target Boundaries(1) = 101
-  Potential = {supply_voltage}
-End
-
-! Ground Reference (0V return path)
-Boundary Condition 2
-  Name = "Ground_Reference"
-  Target Boundaries(1) = 102
-  Potential = {ground_voltage}
-End
-
-! All other boundaries are natural BC (insulating, zero normal current)
-"""
-
 sif_file = os.path.join(output_dir, "pdn_unified.sif")
-with open(sif_file, 'w') as f:
-    f.write(sif_content)
+write_stat_current_sif(sif_file, "pdn_unified", sigma_eff_copper, supply_voltage, ground_voltage,
+                       use_direct_solver=use_direct_solver,
+                       fields=("Electric Field", "Current Density", "Joule Heating"))
 print(f"Solver input file: {sif_file}")
 
 # ==============================================================================
 # RUN ELMERFEM SOLVER
 # ==============================================================================
 
+use_mpi = bool(mpi_procs > 1 and shutil.which("mpirun") and shutil.which("ElmerSolver_mpi"))
+if mpi_procs > 1 and not use_mpi:
+    print("⚠ mpirun or ElmerSolver_mpi not found, running serially")
+
+if use_mpi:
+    # Partition the Elmer mesh database written above in place
+    print(f"Partitioning mesh into {mpi_procs} parts...")
+    subprocess.run(["ElmerGrid", "2", "2", ".", "-partdual", "-metiskway", str(mpi_procs)],
+                   cwd=output_dir, check=True, stdout=subprocess.DEVNULL)
+    solver_cmd = ["mpirun", "-np", str(mpi_procs), "ElmerSolver_mpi", "pdn_unified.sif"]
+else:
+    solver_cmd = ["ElmerSolver", "pdn_unified.sif"]
+
 print("\n" + "="*70)
 print("Running ElmerSolver...")
 print("="*70 + "\n")
+print(f"  Processes: {mpi_procs if use_mpi else 1}")
 
 solver_log = os.path.join(output_dir, "solver.log")
 with open(solver_log, 'w') as log_file:
     result = subprocess.run(
-        ["ElmerSolver", "pdn_unified.sif"],
+        solver_cmd,
         cwd=output_dir,
         stdout=log_file,
         stderr=subprocess.STDOUT
@@ -316,6 +166,8 @@ import glob
 vtu_pattern1 = os.path.join(output_dir, "pdn_unified*.vtu")
 vtu_pattern2 = os.path.join(output_dir, "simulation", "pdn_unified*.vtu")
 vtu_files = glob.glob(vtu_pattern1) + glob.glob(vtu_pattern2)
+# MPI runs write one .vtu per partition plus a .pvtu that collects them
+vtu_files = glob.glob(os.path.join(output_dir, "pdn_unified*.pvtu")) + vtu_files
 
 if vtu_files:
     vtu_file = vtu_files[0]
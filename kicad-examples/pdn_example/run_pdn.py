@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+"""
+Run the uniform-copper PDN variants in one Python process
+
+pdn_simple.py and pdn_unified_simple.py share pdn_common, so running them
+back to back here imports numpy and gmsh and starts the gmsh session once.
+"""
+import os
+import runpy
+
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+for script in ["pdn_simple.py", "pdn_unified_simple.py"]:
+    print(f"\n>>> {script}")
+    runpy.run_path(script, run_name="__main__")
@@ -24,6 +24,7 @@ Prerequisites:
 import os
 import sys
 import subprocess
+import numpy as np
 import gmsh
 
 # ============================================================================
@@ -71,6 +72,14 @@ if not os.path.exists(step_file):
 gmsh.initialize()
 gmsh.option.setNumber("General.Terminal", 1)
 
+# One gmsh thread per core; OCCParallel also parallelizes the STEP import
+# and healing, the Frontal-Delaunay 2D mesher meshes surfaces in parallel
+num_procs = os.cpu_count() or 1
+gmsh.option.setNumber("General.NumThreads", num_procs)
+gmsh.option.setNumber("Geometry.OCCParallel", 1)
+gmsh.option.setNumber("Mesh.Algorithm", 6)
+gmsh.option.setNumber("Mesh.MaxNumThreads2D", num_procs)
+
 # Import STEP file
 try:
     gmsh.merge(step_file)
@@ -111,20 +120,18 @@ print(f"  Found {len(surfaces)} surfaces in STEP file")
 
 # Get bounding boxes of all surfaces to identify layers
 print("\n  Analyzing surface heights:")
-top_surfaces = []
-bottom_surfaces = []
+# Fetch every surface bounding box once, then split the layers with a mask
+# bbox = [xmin, ymin, zmin, xmax, ymax, zmax]
+surface_tags = np.array([tag for _, tag in surfaces], dtype=np.int64)
+bbox = np.array([gmsh.model.getBoundingBox(dim, tag) for dim, tag in surfaces]).reshape(-1, 6)
+z_center = (bbox[:, 2] + bbox[:, 5]) / 2
+top_mask = z_center > 1.0  # Likely top layer, the rest likely bottom layer
 
-for dim, tag in surfaces:
-    bbox = gmsh.model.getBoundingBox(dim, tag)
-    # bbox = [xmin, ymin, zmin, xmax, ymax, zmax]
-    z_center = (bbox[2] + bbox[5]) / 2
+top_surfaces = surface_tags[top_mask].tolist()
+bottom_surfaces = surface_tags[~top_mask].tolist()
 
-    if z_center > 1.0:  # Likely top layer
-        top_surfaces.append(tag)
-        print(f"    Surface {tag}: z = {z_center:.3f} mm (Top Layer)")
-    else:  # Likely bottom layer
-        bottom_surfaces.append(tag)
-        print(f"    Surface {tag}: z = {z_center:.3f} mm (Bottom Layer)")
+print("\n".join(f"    Surface {tag}: z = {z:.3f} mm ({'Top' if top else 'Bottom'} Layer)"
+                for tag, z, top in zip(surface_tags, z_center, top_mask)))
 
 # Create physical groups for materials
 if top_surfaces:
@@ -157,9 +164,8 @@ gmsh.option.setNumber("Mesh.CharacteristicLengthMax", mesh_size)
 # Generate 2D mesh
 gmsh.model.mesh.generate(2)
 
-# Get mesh statistics
-nodes = gmsh.model.mesh.getNodes()
-print(f"  ✓ Generated mesh with {len(nodes[0])} nodes")
+# Mesh statistics are counted inside gmsh, without copying the mesh out
+print(f"  ✓ Generated mesh with {int(gmsh.option.getNumber('Mesh.NbNodes'))} nodes")
 
 # Write mesh file
 mesh_file = os.path.join(sim_path, "mesh.msh")
@@ -300,15 +306,23 @@ print("             based on your PCB geometry.")
 print("\n[6/6] Running ElmerSolver...")
 print("  (Note: Results will be trivial without boundary conditions)")
 
-result = subprocess.run(
-    ["ElmerSolver", "case.sif"],
-    cwd=sim_path,
-    capture_output=True,
-    text=True,
-    timeout=120
-)
-
-if "ELMER SOLVER FINISHED" in result.stdout or "ALL DONE" in result.stdout:
+# Solver output streams to a log file rather than a pipe; only its tail is
+# read back to check for the completion banner
+solver_log = os.path.join(sim_path, "solver.log")
+with open(solver_log, 'wb') as log:
+    subprocess.run(
+        ["ElmerSolver", "case.sif"],
+        cwd=sim_path,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+        timeout=120
+    )
+
+with open(solver_log, 'rb') as f:
+    f.seek(max(0, os.path.getsize(solver_log) - 1000))
+    log_tail = f.read().decode(errors='replace')
+
+if "ELMER SOLVER FINISHED" in log_tail or "ALL DONE" in log_tail:
     print("  ✓ Solver completed")
 
     vtu_files = [f for f in os.listdir(sim_path) if f.endswith('.vtu')]
@@ -318,7 +332,8 @@ if "ELMER SOLVER FINISHED" in result.stdout or "ALL DONE" in result.stdout:
         print(f"  ✓ Created: {vtu_file} ({file_size} bytes)")
 else:
     print("  ⚠ Check solver output for warnings:")
-    print(result.stdout[-1000:])
+    print(log_tail)
+    print(f"  Full log: {solver_log}")
 
 # ============================================================================
 # Summary
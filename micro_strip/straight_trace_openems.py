@@ -9,11 +9,16 @@ Easily modifiable parameters for students to explore EM wave propagation
 import math
 import numpy as np
 import os, shutil
-from pylab import *
 import CSXCAD
 from openEMS import openEMS
 from openEMS.physical_constants import *
 
+# psutil is optional: it tells physical cores apart from hyperthreads
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 # =============================================================================
 # STUDENT-MODIFIABLE PARAMETERS
 # =============================================================================
@@ -43,6 +48,11 @@ GROUND_THICKNESS = 0.035
 BOARD_WIDTH = 20.0
 BOARD_LENGTH = 60.0
 
+# Plain air between the board and the absorbing (PML) boundary. The
+# quasi-TEM fields decay within ~2 mm of the trace, so more air only adds cells.
+AIR_PADDING = 3.0
+PML_CELLS = 6            # Absorbing layers on each outer face
+
 # Material properties
 FR4_EPSILON = 4.6
 COPPER_CONDUCTIVITY = 5.8e7
@@ -68,12 +78,26 @@ MAX_TIMESTEPS = 23000    # Number of timesteps to run
 MIN_DECREMENT = 0.1      # Stop when energy decays to this level (0.1 = -10dB)
                          # Lower = more strict (0.01 = -20dB), takes longer
 
+# Field dumps (the .vtr files for ParaView)
+ENABLE_FIELD_DUMPS = True  # Set to False when only port voltages/currents
+                           # are needed - dump writing is the biggest cost
+                           # after the FDTD update itself
+DUMP_SUB_SAMPLING = [2, 2, 1]  # Keep every 2nd mesh line in X and Y for the
+                               # horizontal dumps (1 = full resolution)
+
 # Advanced: 3D field dumps
 ENABLE_3D_DUMPS = False  # Set to True for full 3D volume visualization
                          # WARNING: Creates VERY large files (100x bigger)!
                          # Only enable on fast computer with lots of RAM
                          # Not recommended for Codespaces
 
+# Advanced: mirror symmetry
+USE_Y_SYMMETRY = False   # Set to True to simulate only the y >= 0 half, with
+                         # a magnetic wall (PMC) on the trace centreline.
+                         # Same physics at half the cells; the field dumps
+                         # then cover half the board (mirror them in
+                         # ParaView with the Reflect filter)
+
 # =============================================================================
 # SETUP
 # =============================================================================
@@ -81,30 +105,62 @@ ENABLE_3D_DUMPS = False  # Set to True for full 3D volume visualization
 # openEMS works in meters, so we define a conversion factor for millimeters
 MM = 0.001
 
+# Derived geometry used throughout (mm); everything is centred on the origin
+HALF_TL = TRACE_LENGTH/2                 # trace ends at x = ±HALF_TL
+HALF_TW = TRACE_WIDTH/2                  # trace sides at y = ±HALF_TW
+HALF_BL = BOARD_LENGTH/2                 # board ends at x = ±HALF_BL
+HALF_BW = BOARD_WIDTH/2                  # board sides at y = ±HALF_BW
+Z_TOP = FR4_THICKNESS + TRACE_THICKNESS  # top face of the trace
+
+# Lower Y edge of the board and trace: the centreline when only the upper
+# half is simulated
+Y_MIN_BOARD = 0.0 if USE_Y_SYMMETRY else -HALF_BW
+Y_MIN_TRACE = 0.0 if USE_Y_SYMMETRY else -HALF_TW
+
+# openEMS turns the outermost PML_CELLS mesh cells into absorber, so the
+# coarse 0.5 mm mesh runs that much further than the air padding
+MESH_PADDING = AIR_PADDING + PML_CELLS*0.5
+
 # Simulation folder
 currDir = os.getcwd()
 Sim_Path = os.path.join(currDir, 'output_files')
-if os.path.exists(Sim_Path):
-    shutil.rmtree(Sim_Path)
-os.mkdir(Sim_Path)
+# Keep the folder and delete only the previous run's files; removing and
+# recreating the whole tree is slow on WSL and network file systems
+os.makedirs(Sim_Path, exist_ok=True)
+for entry in os.scandir(Sim_Path):
+    if entry.is_dir(follow_symlinks=False):
+        shutil.rmtree(entry.path)
+    else:
+        os.remove(entry.path)
 
 # Setup FDTD
 CSX = CSXCAD.ContinuousStructure()
+# High oversampling only pays off for the custom pulse shapes; the built-in
+# Gaussian and sine excitations are already smooth at the FDTD timestep
+OVERSAMPLING = 100 if EXCITATION_TYPE in ("step", "square_pulse") else 10
+
 FDTD = openEMS(
     NrTS=MAX_TIMESTEPS,
     EndCriteria=MIN_DECREMENT,
-    OverSampling=100  # High oversampling for accurate custom pulse shapes
+    OverSampling=OVERSAMPLING
 )
 FDTD.SetCSX(CSX)
 
 # Boundary conditions - PML absorbing
-BC = ["PML_8","PML_8","PML_8","PML_8","PML_8","PML_8"]
+# Order: xmin, xmax, ymin, ymax, zmin, zmax. With USE_Y_SYMMETRY the ymin
+# face is the PMC symmetry wall at y = 0.
+PML = f"PML_{PML_CELLS}"
+BC = [PML, PML, "PMC" if USE_Y_SYMMETRY else PML, PML, PML, PML]
 FDTD.SetBoundaryCond(BC)
 
 # Excitation - setup based on type
 f0 = EXCITATION_FREQ
 fc = EXCITATION_BW
 
+# openEMS evaluates custom excitation strings once per (oversampled) timestep,
+# so constant factors are folded here and passed in as plain numbers
+omega0 = 2*math.pi*f0
+
 if EXCITATION_TYPE == "gaussian":
     # Modulated Gaussian pulse - broadband RF spectrum centered at f0
     FDTD.SetGaussExcite(f0, fc)
@@ -117,8 +173,8 @@ elif EXCITATION_TYPE == "sinusoidal":
 
 elif EXCITATION_TYPE == "step":
     # Modulated step - RF carrier that turns on smoothly
-    tau = 1.0/fc  # rise time
-    FDTD.SetCustomExcite(f"(1-exp(-1*(t/{tau})^2))*sin(2*pi*{f0}*t)".encode(), 0, f0)
+    # rise time tau = 1/fc, so t/tau = fc*t
+    FDTD.SetCustomExcite(f"(1-exp(-({fc!r}*t)^2))*sin({omega0!r}*t)".encode(), 0, f0)
     excite_str = f"Step (modulated): {f0/1e9:.2f} GHz turning on"
 
 elif EXCITATION_TYPE == "square_pulse":
@@ -126,7 +182,8 @@ elif EXCITATION_TYPE == "square_pulse":
     # Use smooth rectangular window with tanh edges (parser doesn't have heaviside)
     rise_time = PULSE_WIDTH / 20.0  # 5% rise time
     k = 10.0 / rise_time  # steepness parameter
-    FDTD.SetCustomExcite(f"(0.5*(1+tanh({k}*t)) - 0.5*(1+tanh({k}*(t-{PULSE_WIDTH}))))*sin(2*pi*{f0}*t)".encode(), 0, f0)
+    # 0.5*(1+tanh(k*t)) - 0.5*(1+tanh(k*(t-W))) simplifies to this
+    FDTD.SetCustomExcite(f"0.5*(tanh({k!r}*t) - tanh({k!r}*t - {k*PULSE_WIDTH!r}))*sin({omega0!r}*t)".encode(), 0, f0)
     excite_str = f"Square pulse (modulated): {PULSE_WIDTH*1e9:.1f} ns at {f0/1e9:.2f} GHz"
 
 else:
@@ -139,6 +196,8 @@ print(f"Trace: {TRACE_LENGTH} x {TRACE_WIDTH} mm")
 print(f"FR4: {FR4_THICKNESS} mm, εr = {FR4_EPSILON}")
 print(f"Excitation: {excite_str}")
 print(f"Load: {LOAD_RESISTANCE} Ω")
+if USE_Y_SYMMETRY:
+    print("Symmetry: y >= 0 half only (PMC wall at y = 0)")
 print("="*70)
 
 # =============================================================================
@@ -149,8 +208,8 @@ print("="*70)
 # Ground plane (PEC - perfect conductor)
 gnd = CSX.AddMetal('ground')
 gnd.AddBox(
-    start=[-BOARD_LENGTH/2, -BOARD_WIDTH/2, -GROUND_THICKNESS],
-    stop=[BOARD_LENGTH/2, BOARD_WIDTH/2, 0],
+    start=[-HALF_BL, Y_MIN_BOARD, -GROUND_THICKNESS],
+    stop=[HALF_BL, HALF_BW, 0],
     priority=9800
 )
 
@@ -158,16 +217,16 @@ gnd.AddBox(
 fr4 = CSX.AddMaterial('fr4')
 fr4.SetMaterialProperty(epsilon=FR4_EPSILON, mue=1)
 fr4.AddBox(
-    start=[-BOARD_LENGTH/2, -BOARD_WIDTH/2, 0],
-    stop=[BOARD_LENGTH/2, BOARD_WIDTH/2, FR4_THICKNESS],
+    start=[-HALF_BL, Y_MIN_BOARD, 0],
+    stop=[HALF_BL, HALF_BW, FR4_THICKNESS],
     priority=9700 # Lower priority than metal, so metal is drawn on top
 )
 
 # Trace (copper)
 trace = CSX.AddMetal('trace')
 trace.AddBox(
-    start=[-TRACE_LENGTH/2, -TRACE_WIDTH/2, FR4_THICKNESS],
-    stop=[TRACE_LENGTH/2, TRACE_WIDTH/2, FR4_THICKNESS + TRACE_THICKNESS],
+    start=[-HALF_TL, Y_MIN_TRACE, FR4_THICKNESS],
+    stop=[HALF_TL, HALF_TW, Z_TOP],
     priority=9900 # Highest priority
 )
 
@@ -178,50 +237,76 @@ trace.AddBox(
 # fine around the trace (where fields change rapidly) and coarse elsewhere.
 # =============================================================================
 
-mesh_x = np.array([])
-mesh_y = np.array([])
-mesh_z = np.array([])
-
-# Helper function
+# Helper function: evenly spaced lines from start to stop, about step apart.
+# The line count comes from the span, so float rounding in the step can
+# neither drop nor duplicate the endpoint, and the result is always an array.
 def arangeWithEndpoint(start, stop, step=1, endpoint=True):
-    if start == stop:
-        return [start]
-    arr = np.arange(start, stop, step)
-    if endpoint and arr[-1] + step == stop:
-        arr = np.concatenate([arr, [stop]])
-    return arr
-
-# X-direction: Fine mesh along the length of the trace
-mesh_x = np.concatenate([mesh_x, arangeWithEndpoint(-BOARD_LENGTH/2-10, -TRACE_LENGTH/2-2, 0.5)])
-mesh_x = np.concatenate([mesh_x, arangeWithEndpoint(-TRACE_LENGTH/2-2, TRACE_LENGTH/2+2, 0.1)])  # Fine!
-mesh_x = np.concatenate([mesh_x, arangeWithEndpoint(TRACE_LENGTH/2+2, BOARD_LENGTH/2+10, 0.5)])
-
-# Y-direction: Fine mesh across the width of the trace
-mesh_y = np.concatenate([mesh_y, arangeWithEndpoint(-BOARD_WIDTH/2-10, -TRACE_WIDTH/2-2, 0.5)])
-mesh_y = np.concatenate([mesh_y, arangeWithEndpoint(-TRACE_WIDTH/2-2, TRACE_WIDTH/2+2, 0.1)])  # Fine!
-mesh_y = np.concatenate([mesh_y, arangeWithEndpoint(TRACE_WIDTH/2+2, BOARD_WIDTH/2+10, 0.5)])
+    n = int(round((stop - start) / step))
+    if endpoint:
+        return np.linspace(start, stop, n + 1)
+    return np.linspace(start, stop, n, endpoint=False)
+
+# Build one mesh axis from (start, stop, step) regions. Each region becomes
+# one arangeWithEndpoint segment; the segments are joined in a single pass.
+# They are already increasing, so the in-place sort is a near no-op, and only
+# the shared region endpoints (or near-equal lines) need dropping.
+def buildGradedAxis(regions):
+    axis = np.concatenate([arangeWithEndpoint(start, stop, step) for start, stop, step in regions])
+    axis.sort()
+    keep = np.empty(len(axis), dtype=bool)
+    keep[0] = True
+    np.greater(np.diff(axis), 1e-9, out=keep[1:])
+    return axis[keep]
+
+# X-direction: Fine mesh at the trace ends (and the ports there), medium
+# along the middle of the trace. 0.3 mm is still far below λ/20 in FR4
+# (~7 mm at 1 GHz); the field gradients sit at the edges, not the middle.
+mesh_x = buildGradedAxis([
+    (-HALF_BL-MESH_PADDING, -HALF_TL-2, 0.5),
+    (-HALF_TL-2, -HALF_TL+2, 0.1),  # Fine!
+    (-HALF_TL+2, HALF_TL-2, 0.3),
+    (HALF_TL-2, HALF_TL+2, 0.1),  # Fine!
+    (HALF_TL+2, HALF_BL+MESH_PADDING, 0.5),
+])
+
+# Y-direction: Fine mesh within 0.5 mm of the trace sides, medium between
+if USE_Y_SYMMETRY:
+    # Upper half only, starting at the symmetry wall
+    mesh_y = buildGradedAxis([
+        (0, HALF_TW-0.5, 0.3),
+        (HALF_TW-0.5, HALF_TW+2, 0.1),  # Fine!
+        (HALF_TW+2, HALF_BW+MESH_PADDING, 0.5),
+    ])
+else:
+    mesh_y = buildGradedAxis([
+        (-HALF_BW-MESH_PADDING, -HALF_TW-2, 0.5),
+        (-HALF_TW-2, -HALF_TW+0.5, 0.1),  # Fine!
+        (-HALF_TW+0.5, HALF_TW-0.5, 0.3),
+        (HALF_TW-0.5, HALF_TW+2, 0.1),  # Fine!
+        (HALF_TW+2, HALF_BW+MESH_PADDING, 0.5),
+    ])
 
 # Z-direction: Fine mesh through the conductors and substrate
-mesh_z = np.concatenate([mesh_z, arangeWithEndpoint(-10, -GROUND_THICKNESS-0.1, 0.5)])
-# Multiple lines through ground plane
-mesh_z = np.concatenate([mesh_z, np.linspace(-GROUND_THICKNESS, 0, 3)])
-# Medium resolution through FR4
-mesh_z = np.concatenate([mesh_z, arangeWithEndpoint(0.05, FR4_THICKNESS-0.05, 0.2)])
-# Multiple lines through trace
-mesh_z = np.concatenate([mesh_z, np.linspace(FR4_THICKNESS, FR4_THICKNESS+TRACE_THICKNESS, 3)])
-# Coarse above trace
-mesh_z = np.concatenate([mesh_z, arangeWithEndpoint(FR4_THICKNESS+TRACE_THICKNESS+0.1, 10, 0.5)])
-
-# Remove duplicates and set mesh
-mesh_x = np.unique(mesh_x)
-mesh_y = np.unique(mesh_y)
-mesh_z = np.unique(mesh_z)
+mesh_z = buildGradedAxis([
+    (-GROUND_THICKNESS-MESH_PADDING, -GROUND_THICKNESS-0.1, 0.5),
+    # Ground plane: one cell through the copper. A line inside it would halve
+    # the smallest cell and with it the CFL timestep of the whole run.
+    (-GROUND_THICKNESS, 0, GROUND_THICKNESS),
+    # Medium resolution through FR4
+    (0.05, FR4_THICKNESS-0.05, 0.2),
+    # Trace: one cell through the copper, same reason
+    (FR4_THICKNESS, Z_TOP, TRACE_THICKNESS),
+    # Coarse above trace
+    (Z_TOP+0.1, Z_TOP+MESH_PADDING, 0.5),
+])
 
 openEMS_grid = CSX.GetGrid()
 openEMS_grid.SetDeltaUnit(MM)
-openEMS_grid.AddLine('x', mesh_x)
-openEMS_grid.AddLine('y', mesh_y)
-openEMS_grid.AddLine('z', mesh_z)
+# 0.1 µm is far below any cell size; rounding keeps the grid written to the
+# simulation XML short (every geometry edge is a round number already)
+openEMS_grid.AddLine('x', np.round(mesh_x, 4))
+openEMS_grid.AddLine('y', np.round(mesh_y, 4))
+openEMS_grid.AddLine('z', np.round(mesh_z, 4))
 
 print(f"\nMesh: {len(mesh_x)} x {len(mesh_y)} x {len(mesh_z)} = {len(mesh_x)*len(mesh_y)*len(mesh_z):,} cells")
 
@@ -229,14 +314,18 @@ print(f"\nMesh: {len(mesh_x)} x {len(mesh_y)} x {len(mesh_z)} = {len(mesh_x)*len
 # PORTS
 # =============================================================================
 
+# A half-width port carries half the current at the same voltage, so with
+# USE_Y_SYMMETRY each port resistor is doubled to keep the full-port value
+port_r_scale = 2 if USE_Y_SYMMETRY else 1
+
 # Port 1: Source (left end)
 port_width = 1.0
-port1_start = [-TRACE_LENGTH/2, -TRACE_WIDTH/2, -GROUND_THICKNESS]
-port1_stop = [-TRACE_LENGTH/2 + port_width, TRACE_WIDTH/2, FR4_THICKNESS + TRACE_THICKNESS]
+port1_start = [-HALF_TL, Y_MIN_TRACE, -GROUND_THICKNESS]
+port1_stop = [-HALF_TL + port_width, HALF_TW, Z_TOP]
 
 port1 = FDTD.AddLumpedPort(
     port_nr=1,
-    R=50.0,
+    R=50.0 * port_r_scale,
     start=port1_start,
     stop=port1_stop,
     p_dir='z',
@@ -245,12 +334,12 @@ port1 = FDTD.AddLumpedPort(
 )
 
 # Port 2: Load (right end)
-port2_start = [TRACE_LENGTH/2 - port_width, -TRACE_WIDTH/2, -GROUND_THICKNESS]
-port2_stop = [TRACE_LENGTH/2, TRACE_WIDTH/2, FR4_THICKNESS + TRACE_THICKNESS]
+port2_start = [HALF_TL - port_width, Y_MIN_TRACE, -GROUND_THICKNESS]
+port2_stop = [HALF_TL, HALF_TW, Z_TOP]
 
 port2 = FDTD.AddLumpedPort(
     port_nr=2,
-    R=LOAD_RESISTANCE,
+    R=LOAD_RESISTANCE * port_r_scale,
     start=port2_start,
     stop=port2_stop,
     p_dir='z',
@@ -262,62 +351,65 @@ port2 = FDTD.AddLumpedPort(
 # FIELD DUMPS (Like working example - horizontal planes!)
 # =============================================================================
 
-# E-field at Z=1.0mm (middle of FR4) - this is what works!
-efield_dump = CSX.AddDump('efield', dump_type=0, dump_mode=2)
-efield_dump.AddBox(
-    start=[-BOARD_LENGTH/2, -BOARD_WIDTH/2, 1.0],
-    stop=[BOARD_LENGTH/2, BOARD_WIDTH/2, 1.0]
-)
-
-# H-field at Z=0.9mm (near bottom of FR4)
-hfield_dump = CSX.AddDump('hfield', dump_type=1, dump_mode=2)
-hfield_dump.AddBox(
-    start=[-BOARD_LENGTH/2, -BOARD_WIDTH/2, 0.9],
-    stop=[BOARD_LENGTH/2, BOARD_WIDTH/2, 0.9]
-)
-
-# E-field cross-section (YZ plane at X=0)
-cross_efield_dump = CSX.AddDump('cross_section_E', dump_type=0, dump_mode=2)
-cross_efield_dump.AddBox(
-    start=[0, -BOARD_WIDTH/2, -GROUND_THICKNESS-1],
-    stop=[0, BOARD_WIDTH/2, FR4_THICKNESS + TRACE_THICKNESS + 2]
-)
-
-# H-field cross-section (YZ plane at X=0) - shows magnetic field loops!
-cross_hfield_dump = CSX.AddDump('cross_section_H', dump_type=1, dump_mode=2)
-cross_hfield_dump.AddBox(
-    start=[0, -BOARD_WIDTH/2, -GROUND_THICKNESS-1],
-    stop=[0, BOARD_WIDTH/2, FR4_THICKNESS + TRACE_THICKNESS + 2]
-)
+if ENABLE_FIELD_DUMPS:
+    # E-field at Z=1.0mm (middle of FR4) - this is what works!
+    efield_dump = CSX.AddDump('efield', dump_type=0, dump_mode=2, sub_sampling=DUMP_SUB_SAMPLING)
+    efield_dump.AddBox(
+        start=[-HALF_BL, Y_MIN_BOARD, 1.0],
+        stop=[HALF_BL, HALF_BW, 1.0]
+    )
 
-# Optional 3D volume dumps (disabled by default - very large files!)
-if ENABLE_3D_DUMPS:
-    # 3D E-field volume around trace region only
-    efield_3d_dump = CSX.AddDump('efield_3D', dump_type=0, dump_mode=2,
-                                  sub_sampling=[4, 4, 4])  # Reduce resolution to save space
-    efield_3d_dump.AddBox(
-        start=[-TRACE_LENGTH/2-5, -TRACE_WIDTH/2-5, -GROUND_THICKNESS],
-        stop=[TRACE_LENGTH/2+5, TRACE_WIDTH/2+5, FR4_THICKNESS + TRACE_THICKNESS + 2]
+    # H-field at Z=0.9mm (near bottom of FR4)
+    hfield_dump = CSX.AddDump('hfield', dump_type=1, dump_mode=2, sub_sampling=DUMP_SUB_SAMPLING)
+    hfield_dump.AddBox(
+        start=[-HALF_BL, Y_MIN_BOARD, 0.9],
+        stop=[HALF_BL, HALF_BW, 0.9]
     )
 
-    # 3D H-field volume
-    hfield_3d_dump = CSX.AddDump('hfield_3D', dump_type=1, dump_mode=2,
-                                  sub_sampling=[4, 4, 4])
-    hfield_3d_dump.AddBox(
-        start=[-TRACE_LENGTH/2-5, -TRACE_WIDTH/2-5, -GROUND_THICKNESS],
-        stop=[TRACE_LENGTH/2+5, TRACE_WIDTH/2+5, FR4_THICKNESS + TRACE_THICKNESS + 2]
+    # E-field cross-section (YZ plane at X=0)
+    cross_efield_dump = CSX.AddDump('cross_section_E', dump_type=0, dump_mode=2)
+    cross_efield_dump.AddBox(
+        start=[0, Y_MIN_BOARD, -GROUND_THICKNESS-1],
+        stop=[0, HALF_BW, Z_TOP + 2]
     )
 
-    print("\n  WARNING: 3D dumps enabled - will create large files!")
+    # H-field cross-section (YZ plane at X=0) - shows magnetic field loops!
+    cross_hfield_dump = CSX.AddDump('cross_section_H', dump_type=1, dump_mode=2)
+    cross_hfield_dump.AddBox(
+        start=[0, Y_MIN_BOARD, -GROUND_THICKNESS-1],
+        stop=[0, HALF_BW, Z_TOP + 2]
+    )
 
-print("\nField dumps:")
-print("  - E-field horizontal (Z=1.0mm) for wave propagation")
-print("  - H-field horizontal (Z=0.9mm)")
-print("  - E-field cross-section (YZ at X=0)")
-print("  - H-field cross-section (YZ at X=0) - shows magnetic loops")
-if ENABLE_3D_DUMPS:
-    print("  - E-field 3D volume (around trace region)")
-    print("  - H-field 3D volume (around trace region)")
+    # Optional 3D volume dumps (disabled by default - very large files!)
+    if ENABLE_3D_DUMPS:
+        # 3D E-field volume around trace region only
+        efield_3d_dump = CSX.AddDump('efield_3D', dump_type=0, dump_mode=2,
+                                     sub_sampling=[4, 4, 4])  # Reduce resolution to save space
+        efield_3d_dump.AddBox(
+            start=[-HALF_TL-5, max(Y_MIN_BOARD, -HALF_TW-5), -GROUND_THICKNESS],
+            stop=[HALF_TL+5, HALF_TW+5, Z_TOP + 2]
+        )
+
+        # 3D H-field volume
+        hfield_3d_dump = CSX.AddDump('hfield_3D', dump_type=1, dump_mode=2,
+                                     sub_sampling=[4, 4, 4])
+        hfield_3d_dump.AddBox(
+            start=[-HALF_TL-5, max(Y_MIN_BOARD, -HALF_TW-5), -GROUND_THICKNESS],
+            stop=[HALF_TL+5, HALF_TW+5, Z_TOP + 2]
+        )
+
+        print("\n  WARNING: 3D dumps enabled - will create large files!")
+
+    print("\nField dumps:")
+    print("  - E-field horizontal (Z=1.0mm) for wave propagation")
+    print("  - H-field horizontal (Z=0.9mm)")
+    print("  - E-field cross-section (YZ at X=0)")
+    print("  - H-field cross-section (YZ at X=0) - shows magnetic loops")
+    if ENABLE_3D_DUMPS:
+        print("  - E-field 3D volume (around trace region)")
+        print("  - H-field 3D volume (around trace region)")
+else:
+    print("\nField dumps: disabled (port voltages/currents only)")
 
 # =============================================================================
 # RUN SIMULATION
@@ -327,14 +419,21 @@ print("\n" + "="*70)
 print("Running simulation...")
 print("="*70)
 
-FDTD.Run(Sim_Path, cleanup=True, verbose=3)
+# One engine thread per physical core: the FDTD update is memory bound, so
+# hyperthreads only contend for bandwidth and make run times erratic
+num_threads = (psutil.cpu_count(logical=False) if psutil else None) or os.cpu_count() or 1
+print(f"Threads: {num_threads}")
+
+# Sim_Path was already emptied above, so openEMS need not clean it again
+FDTD.Run(Sim_Path, cleanup=False, verbose=3, numThreads=num_threads)
 
 print("\n" + "="*70)
 print("Simulation Complete!")
 print("="*70)
 print(f"\nResults in: {Sim_Path}/")
-print("\nVisualize in ParaView:")
-print("  - efield_*.vtr - Wave propagation in XY plane")
-print("  - hfield_*.vtr - Magnetic field")
-print("  - cross_section_*.vtr - Side view")
+if ENABLE_FIELD_DUMPS:
+    print("\nVisualize in ParaView:")
+    print("  - efield_*.vtr - Wave propagation in XY plane")
+    print("  - hfield_*.vtr - Magnetic field")
+    print("  - cross_section_*.vtr - Side view")
 print("\n" + "="*70)
@@ -2,7 +2,21 @@
 """Quick test to verify OpenEMS + ElmerFEM installation"""
 
 import sys
+import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from test_openems import check_installed
+
+def probe_elmer(cmd):
+    """Run `cmd --version`; return (cmd, passed, info)"""
+    try:
+        result = subprocess.run([cmd, "--version"], capture_output=True, text=True, timeout=2)
+        if result.returncode == 0 or "Elmer" in result.stdout or "Elmer" in result.stderr:
+            return (cmd, True, "found")
+        return (cmd, False, "not working")
+    except Exception:
+        return (cmd, False, "not working")
 
 def test_imports():
     """Test that all required packages can be imported"""
@@ -29,12 +43,13 @@ def test_imports():
     except Exception as e:
         tests.append(("numpy", False, str(e)))
 
+    # matplotlib and meshio are only checked for presence and version:
+    # importing them would run their start-up code (matplotlib builds its
+    # font cache). h5py and pyvista wrap native libraries the simulations
+    # rely on, so they are really imported and a broken install shows up.
+
     # Test matplotlib
-    try:
-        import matplotlib
-        tests.append(("matplotlib", True, f"version {matplotlib.__version__}"))
-    except Exception as e:
-        tests.append(("matplotlib", False, str(e)))
+    tests.append(check_installed("matplotlib"))
 
     # Test h5py
     try:
@@ -44,11 +59,7 @@ def test_imports():
         tests.append(("h5py", False, str(e)))
 
     # Test meshio (for ElmerFEM)
-    try:
-        import meshio
-        tests.append(("meshio", True, f"version {meshio.__version__}"))
-    except Exception as e:
-        tests.append(("meshio", False, str(e)))
+    tests.append(check_installed("meshio"))
 
     # Test pyvista (for ElmerFEM)
     try:
@@ -70,17 +81,13 @@ def test_imports():
     # Test ElmerFEM executables
     print("\nElmerFEM Executables")
     print("=" * 50)
-    elmer_tests = []
-
-    for cmd in ["ElmerSolver", "ElmerGrid", "ElmerGUI"]:
-        try:
-            result = subprocess.run([cmd, "--version"], capture_output=True, text=True, timeout=2)
-            if result.returncode == 0 or "Elmer" in result.stdout or "Elmer" in result.stderr:
-                elmer_tests.append((cmd, True, "found"))
-            else:
-                elmer_tests.append((cmd, False, "not working"))
-        except:
-            elmer_tests.append((cmd, False, "not found"))
+    # Missing executables are reported without spawning anything; the rest
+    # are probed in parallel, so a slow one costs 2 s in total, not each
+    elmer_cmds = ["ElmerSolver", "ElmerGrid", "ElmerGUI"]
+    found = [cmd for cmd in elmer_cmds if shutil.which(cmd)]
+    with ThreadPoolExecutor(max_workers=len(elmer_cmds)) as pool:
+        probed = {r[0]: r for r in pool.map(probe_elmer, found)}
+    elmer_tests = [probed.get(cmd, (cmd, False, "not found")) for cmd in elmer_cmds]
 
     for name, passed, info in elmer_tests:
         status = "✓" if passed else "✗"
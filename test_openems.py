@@ -2,6 +2,17 @@
 """Quick test to verify OpenEMS installation"""
 
 import sys
+from importlib.util import find_spec
+from importlib.metadata import version, PackageNotFoundError
+
+def check_installed(name):
+    """Check that a package is installed without importing it; return (name, passed, info)"""
+    if find_spec(name) is None:
+        return (name, False, f"No module named '{name}'")
+    try:
+        return (name, True, f"version {version(name)}")
+    except PackageNotFoundError:
+        return (name, True, "installed")
 
 def test_imports():
     """Test that all required packages can be imported"""
@@ -28,14 +39,13 @@ def test_imports():
     except Exception as e:
         tests.append(("numpy", False, str(e)))
 
+    # matplotlib is only checked for presence and version: importing it
+    # would build its font cache
+
     # Test matplotlib
-    try:
-        import matplotlib
-        tests.append(("matplotlib", True, f"version {matplotlib.__version__}"))
-    except Exception as e:
-        tests.append(("matplotlib", False, str(e)))
+    tests.append(check_installed("matplotlib"))
 
-    # Test h5py
+    # Test h5py (really imported: openEMS dumps need its libhdf5 to load)
     try:
         import h5py
         tests.append(("h5py", True, f"version {h5py.__version__}"))